@@ -1,11 +1,12 @@
 from ultralytics import YOLO
 import cv2
-import math
+import numpy as np
+from utils import open_video_capture, detection_label, BOX_COLOR, TEXT_COLOR
 
 def video_detection(path_x):
     video_capture = path_x
     # Create a Video Capture Object
-    cap = cv2.VideoCapture(video_capture)
+    cap = open_video_capture(video_capture)
     
     if not cap.isOpened():
         print(f"Error: Cannot open video source: {video_capture}")
@@ -24,20 +25,18 @@ def video_detection(path_x):
         results = model(img, stream=True)
         for r in results:
             boxes = r.boxes
-            for box in boxes:
-                x1, y1, x2, y2 = box.xyxy[0]
-                x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+            xyxy = boxes.xyxy.cpu().numpy().astype(np.int32)
+            conf_pcts = np.rint(boxes.conf.cpu().numpy() * 100).astype(np.int32).tolist()
+            clss = boxes.cls.cpu().numpy().astype(np.int32)
+            for (x1, y1, x2, y2), conf_pct, cls in zip(xyxy, conf_pcts, clss):
                 print(x1, y1, x2, y2)
-                cv2.rectangle(img, (x1, y1), (x2, y2), (255, 0, 255), 3)
-                conf = math.ceil((box.conf[0] * 100)) / 100
-                cls = int(box.cls[0])
+                cv2.rectangle(img, (x1, y1), (x2, y2), BOX_COLOR, 3)
                 class_name = classNames[cls]
-                label = f'{class_name} {conf}'
-                t_size = cv2.getTextSize(label, 0, fontScale=1, thickness=2)[0]
+                label, t_size = detection_label(class_name, conf_pct)
                 print(t_size)
                 c2 = x1 + t_size[0], y1 - t_size[1] - 3
-                cv2.rectangle(img, (x1, y1), c2, [255, 0, 255], -1, cv2.LINE_AA)  # filled
-                cv2.putText(img, label, (x1, y1 - 2), 0, 1, [255, 255, 255], thickness=1, lineType=cv2.LINE_AA)
+                cv2.rectangle(img, (x1, y1), c2, BOX_COLOR, -1, cv2.LINE_AA)  # filled
+                cv2.putText(img, label, (x1, y1 - 2), 0, 1, TEXT_COLOR, thickness=1, lineType=cv2.LINE_AA)
         
         # yield img
         cv2.imshow("Pothole Detection", img) #frame
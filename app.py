@@ -3,48 +3,160 @@
 # Author: Hasan Nayon
 # Repository: https://github.com/HasanNayon/geospatial-ai
 
-from flask import Flask, render_template, request, send_from_directory, Response, jsonify
+from config import SOCKETIO_ASYNC_MODE
+EVENTLET = SOCKETIO_ASYNC_MODE == 'eventlet'
+if EVENTLET:
+    # Must run before anything else imports socket/threading
+    import eventlet
+    eventlet.monkey_patch()
+    from eventlet import tpool
+
+from flask import Flask, render_template, request, send_from_directory, Response, jsonify, stream_with_context
 from flask_socketio import SocketIO, emit
 from ultralytics import YOLO
+import torch
 import os
+import importlib.util
 import cv2
 import csv
+import heapq
+import io
+import json
 from datetime import datetime
 import base64
-import math
+import numpy as np
+import queue
 import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
 # Import from modules
 from config import (
-    SECRET_KEY, UPLOAD_FOLDER, RESULT_FOLDER, DASHCAM_FOLDER,
-    DETECTIONS_CSV, REPAIRS_CSV, DETECTION_CONFIDENCE, CAPTURE_COOLDOWN
+    SECRET_KEY, SOCKETIO_MESSAGE_QUEUE, UPLOAD_FOLDER, RESULT_FOLDER, DASHCAM_FOLDER,
+    DETECTION_CONFIDENCE, CAPTURE_COOLDOWN,
+    MODEL_WEIGHTS, MODEL_ENGINE, MODEL_OPENVINO, MODEL_IMGSZ, MODEL_MAX_BATCH, MODEL_CALIB_DATA, MODEL_WORKSPACE,
+    CAMERA_SOURCE, DASHCAM_IMGSZ, DASHCAM_MAX_DET, PIPELINE_QUEUE_SIZE, PIPELINE_BATCH_SIZE, PIPELINE_BATCH_TIMEOUT,
+    POST_QUEUE_SIZE, SNAPSHOT_JPEG_QUALITY, PREDICT_BATCH_WINDOW
 )
 from database import (
-    init_csv_files, add_detection, get_all_detections, get_all_repairs,
-    move_to_repairs, get_detection_stats
+    init_database, add_detection, iter_detections,
+    move_to_repairs, get_detection_stats, get_detections_by_risk, get_detection_by_id
 )
-from utils import get_automatic_location, nearest_neighbor_path
-from llm_assistant import process_chat_message
+from utils import get_automatic_location, coords_array, nearest_neighbor_path_multistart, open_video_capture, encode_jpeg
+from utils import warmup_route_kernels
+from utils import detection_label, BOX_COLOR, TEXT_COLOR
+from llm_assistant import process_chat_message, stream_chat_message
+from preprocess import GPU_PREPROCESS, letterbox_gpu, unletterbox_boxes, predict_images
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = SECRET_KEY
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=SOCKETIO_ASYNC_MODE,
+                    message_queue=SOCKETIO_MESSAGE_QUEUE)
 
-# Initialize CSV files
-init_csv_files()
+# Initialize the database (imports the CSV files on first run)
+init_database()
 
 # Load model lazily
 model = None
+model_lock = threading.Lock()
+inference_lock = threading.Lock()
+
+# FP16 only makes sense on the GPU; on CPU Ultralytics would silently run FP32 anyway
+HALF = torch.cuda.is_available()
+DEVICE = 0 if HALF else 'cpu'
+
+if HALF:
+    # TF32 matmuls and autotuned cuDNN kernels (input size is fixed) for the PyTorch fallback
+    torch.set_float32_matmul_precision('high')
+    torch.backends.cudnn.benchmark = True
+
+def run_blocking(func, *args, **kwargs):
+    """Run heavy native work (inference, camera reads) on a real OS thread under eventlet so the hub keeps serving"""
+    if EVENTLET:
+        return tpool.execute(func, *args, **kwargs)
+    return func(*args, **kwargs)
+
+def run_inference(func, *args, **kwargs):
+    """Run a model call via run_blocking, one at a time.
+
+    Ultralytics serializes predictions with its own lock anyway; taking ours first keeps that
+    lock uncontended, which matters under eventlet where it is a green lock used from tpool threads.
+    """
+    with inference_lock:
+        return run_blocking(func, *args, **kwargs)
+
+def export_engine():
+    """Build the TensorRT engine once: INT8 on GPUs with INT8 Tensor Cores, FP16 otherwise"""
+    export_args = dict(format="engine", imgsz=MODEL_IMGSZ, device=0,
+                       dynamic=True, batch=MODEL_MAX_BATCH, workspace=MODEL_WORKSPACE)
+    
+    if torch.cuda.get_device_capability(0) >= (7, 2):
+        try:
+            # The exporter keeps the calibration table in best.cache, so rebuilds skip calibration
+            print("Exporting TensorRT INT8 engine...")
+            YOLO(MODEL_WEIGHTS).export(int8=True, data=os.path.abspath(MODEL_CALIB_DATA), **export_args)
+            return
+        except Exception as e:
+            print(f"INT8 export failed, falling back to FP16: {e}")
+    
+    print("Exporting TensorRT FP16 engine...")
+    YOLO(MODEL_WEIGHTS).export(half=True, **export_args)
+
+def export_openvino():
+    """Build the INT8 OpenVINO model once for CPU-only deployments"""
+    print("Exporting OpenVINO INT8 model...")
+    YOLO(MODEL_WEIGHTS).export(format="openvino", int8=True, data=os.path.abspath(MODEL_CALIB_DATA),
+                               imgsz=MODEL_IMGSZ, dynamic=True)
+
+def load_model():
+    """Load the fastest available backend: TensorRT on GPU, OpenVINO on CPU, else PyTorch"""
+    print("Loading YOLO model...")
+    if HALF and not os.path.exists(MODEL_ENGINE):
+        # One-time TensorRT build; the engine is persisted next to the weights
+        try:
+            export_engine()
+        except Exception as e:
+            print(f"TensorRT export unavailable, using PyTorch weights: {e}")
+    elif not HALF and not os.path.exists(MODEL_OPENVINO) and importlib.util.find_spec("openvino"):
+        try:
+            export_openvino()
+        except Exception as e:
+            print(f"OpenVINO export failed, using PyTorch weights: {e}")
+    
+    if HALF and os.path.exists(MODEL_ENGINE):
+        # Engine is already fused, no .fuse() needed
+        loaded = YOLO(MODEL_ENGINE, task="detect")
+    elif not HALF and os.path.exists(MODEL_OPENVINO):
+        loaded = YOLO(MODEL_OPENVINO, task="detect")
+    else:
+        loaded = YOLO(MODEL_WEIGHTS)
+        loaded.fuse()
+        if HALF:
+            # NHWC weights suit Tensor Core convolutions; half=HALF on each call casts to FP16
+            loaded.model.to(memory_format=torch.channels_last)
+    print("Model loaded and optimized!")
+    return loaded
 
 def get_model():
+    """Shared model, loaded on first use (the load, including any one-time export, runs via run_blocking)"""
     global model
     if model is None:
-        print("Loading YOLO model...")
-        model = YOLO("best.pt")
-        model.fuse()
-        print("Model loaded and optimized!")
+        with model_lock:
+            if model is None:
+                model = run_blocking(load_model)
     return model
 
+def warmup_model():
+    """Load the model and push dummy frames through both input sizes before the first request"""
+    try:
+        m = get_model()
+        dummy = np.zeros((MODEL_IMGSZ, MODEL_IMGSZ, 3), dtype=np.uint8)
+        for imgsz in (MODEL_IMGSZ, DASHCAM_IMGSZ):
+            run_inference(predict_images, m, [dummy], imgsz, half=HALF, device=DEVICE, verbose=False)
+        print("Model warmed up")
+    except Exception as e:
+        print(f"Model warm-up failed: {e}")
+
 # Store latest location from browser
 latest_location = {
     'latitude': None, 
@@ -65,7 +177,6 @@ def assistant():
 
 @app.route("/dashboard")
 def dashboard():
-    detections = get_all_detections()
     template_detections = [{
         'ID': d['id'],
         'Timestamp': d['timestamp'],
@@ -74,7 +185,7 @@ def dashboard():
         'Longitude': d['lng'],
         'Detection_Type': d['type'],
         'Confidence': d['confidence']
-    } for d in detections]
+    } for d in iter_detections()]
     return render_template("dashboard.html", detections=template_detections)
 
 @app.route("/dashcam")
@@ -83,7 +194,6 @@ def dashcam():
 
 @app.route("/detections")
 def view_detections():
-    detections = get_all_detections()
     template_detections = [{
         'Timestamp': d['timestamp'],
         'Image_Path': d['image_path'],
@@ -91,7 +201,7 @@ def view_detections():
         'Longitude': d['lng'],
         'Detection_Type': d['type'],
         'Confidence': d['confidence']
-    } for d in detections]
+    } for d in iter_detections()]
     return render_template('detections.html', detections=template_detections)
 
 # ============= FILE SERVING ROUTES =============
@@ -106,6 +216,49 @@ def send_static(path):
 
 # ============= DETECTION ROUTES =============
 
+predict_q = queue.Queue()
+
+def predict_dispatcher():
+    """Run concurrent single-image requests through the model together, up to MODEL_MAX_BATCH at a time"""
+    while True:
+        pending = [predict_q.get()]
+        deadline = time.monotonic() + PREDICT_BATCH_WINDOW
+        while len(pending) < MODEL_MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(predict_q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        # Requests with different thresholds can't share one call
+        by_conf = {}
+        for img, conf, future in pending:
+            by_conf.setdefault(conf, []).append((img, future))
+        
+        for conf, items in by_conf.items():
+            try:
+                results = run_inference(predict_images, get_model(), [img for img, future in items], MODEL_IMGSZ,
+                                        conf=conf, half=HALF, device=DEVICE, verbose=False)
+                for (img, future), result in zip(items, results):
+                    future.set_result(result)
+            except Exception as e:
+                for img, future in items:
+                    future.set_exception(e)
+
+threading.Thread(target=predict_dispatcher, daemon=True).start()
+
+# Load and warm up the model, and compile the route kernels, in the background so the first request doesn't wait for them
+socketio.start_background_task(warmup_model)
+socketio.start_background_task(run_blocking, warmup_route_kernels)
+
+def predict_batched(img, conf):
+    """Queue one BGR image for the batching dispatcher and wait for its Results"""
+    future = Future()
+    predict_q.put((img, conf, future))
+    return future.result()
+
 @app.route("/predict", methods=["POST"])
 def predict():
     if "image" not in request.files:
@@ -118,29 +271,26 @@ def predict():
     latitude = request.form.get('latitude', '0.0')
     longitude = request.form.get('longitude', '0.0')
 
-    m = get_model()
-    results = m.predict(image_path, conf=DETECTION_CONFIDENCE, save=True, 
-                       project=RESULT_FOLDER, name="output", exist_ok=True, 
-                       imgsz=640, verbose=False)
-
+    img = cv2.imread(image_path)
+    result = predict_batched(img, DETECTION_CONFIDENCE)
+    
+    output_dir = os.path.join(RESULT_FOLDER, "output")
+    os.makedirs(output_dir, exist_ok=True)
+    cv2.imwrite(os.path.join(output_dir, image.filename), result.plot())
     detection_made = False
     detection_id = None
-    for result in results:
-        boxes = result.boxes
-        for box in boxes:
-            conf = float(box.conf[0])
-            cls = int(box.cls[0])
-            class_names = ["pothole", "crack"]
-            detection_type = class_names[cls] if cls < len(class_names) else "pothole"
-            
-            detection_id = add_detection(
-                f'static/uploads/{image.filename}',
-                latitude, longitude, detection_type, conf
-            )
-            detection_made = True
-            break
-        if detection_made:
-            break
+    if len(result.boxes):
+        # Only the first box is recorded; read just that one back from the device
+        conf = float(result.boxes.conf[0].item())
+        cls = int(result.boxes.cls[0].item())
+        class_names = ["pothole", "crack"]
+        detection_type = class_names[cls] if cls < len(class_names) else "pothole"
+        
+        detection_id = add_detection(
+            f'static/uploads/{image.filename}',
+            latitude, longitude, detection_type, conf
+        )
+        detection_made = True
 
     return render_template("result.html",
                           input_image=image.filename,
@@ -151,85 +301,271 @@ def predict():
                           current_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
 
 # ============= VIDEO FEED =============
+# Live pipeline, one thread per stage connected by small drop-oldest queues:
+#   capture_worker -> inference_worker (the only thread that touches the model)
+#   -> CameraSource.run (draw + JPEG encode) -> clients, with snapshots saved by post_process_worker
 
-last_capture_time = 0
+last_capture_time = float('-inf')  # time.monotonic() of the last automatic snapshot
+post_q = queue.Queue(maxsize=POST_QUEUE_SIZE)
+
+def post_process_worker():
+    """Save dashcam snapshots, record detections and notify clients off the streaming thread"""
+    while True:
+        frame, class_name, conf, lat, lng = post_q.get()
+        try:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f'pothole_{timestamp}.jpg'
+            filepath = os.path.join(DASHCAM_FOLDER, filename)
+            save_image_bytes(filepath, encode_jpeg(frame, quality=SNAPSHOT_JPEG_QUALITY))
+            
+            detection_id = add_detection(filepath, lat or 0, lng or 0, class_name, conf)
+            
+            socketio.emit('detection_alert', {
+                'id': detection_id,
+                'timestamp': timestamp,
+                'confidence': conf,
+                'type': class_name,
+                'location': f"{lat}, {lng}" if lat and lng else "Unknown"
+            })
+        except Exception as e:
+            print(f"Post-processing error: {e}")
+
+# Started through Socket.IO so its emits work under the eventlet worker as well as threading
+socketio.start_background_task(post_process_worker)
 
 @app.route('/video_feed')
 def video_feed():
     return Response(generate_frames(),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
-def generate_frames():
+def put_latest(q, item):
+    """Put an item on a bounded queue, dropping the oldest entry when it is full"""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+def capture_worker(camera, capture_q, stop_event):
+    """Stage 1: read frames from the camera"""
+    try:
+        while not stop_event.is_set():
+            # grab() keeps the driver buffer drained at sensor rate; frames are only decoded
+            # when inference has room for them, so a slow model never works through a backlog
+            if not run_blocking(camera.grab):
+                break
+            if capture_q.full():
+                continue
+            
+            success, frame = run_blocking(camera.retrieve)
+            if not success:
+                break
+            put_latest(capture_q, frame)
+    finally:
+        put_latest(capture_q, None)
+
+def collect_batch(capture_q, first_frame):
+    """Gather up to PIPELINE_BATCH_SIZE frames, waiting at most PIPELINE_BATCH_TIMEOUT"""
+    frames = [first_frame]
+    deadline = time.monotonic() + PIPELINE_BATCH_TIMEOUT
+    while len(frames) < PIPELINE_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            frame = capture_q.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if frame is None:
+            return frames, True
+        frames.append(frame)
+    return frames, False
+
+def inference_worker(m, capture_q, infer_q, stop_event):
+    """Stage 2: run the model on batches of captured frames"""
+    try:
+        finished = False
+        while not finished and not stop_event.is_set():
+            try:
+                frame = capture_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if frame is None:
+                break
+            
+            frames, finished = collect_batch(capture_q, frame)
+            # Single-class model: class-agnostic NMS over at most DASHCAM_MAX_DET boxes
+            predict_args = dict(conf=DETECTION_CONFIDENCE, iou=0.5, imgsz=DASHCAM_IMGSZ, agnostic_nms=True,
+                                classes=[0], max_det=DASHCAM_MAX_DET, half=HALF, device=DEVICE, verbose=False)
+            if GPU_PREPROCESS:
+                batch, meta = letterbox_gpu(frames, DASHCAM_IMGSZ, half=HALF)
+                results = run_inference(m, batch, **predict_args)
+                for frame, r, frame_meta in zip(frames, results, meta):
+                    put_latest(infer_q, (frame, unletterbox_boxes(r.boxes, frame_meta, frame.shape[:2])))
+            else:
+                results = run_inference(m, frames, **predict_args)
+                for frame, r in zip(frames, results):
+                    put_latest(infer_q, (frame, r.boxes))
+    finally:
+        put_latest(infer_q, None)
+
+def annotate_frame(frame, boxes):
+    """Draw detections on a frame and queue a snapshot when the capture cooldown allows"""
     global last_capture_time
-    camera = cv2.VideoCapture(0)
-    camera.set(cv2.CAP_PROP_FRAME_WIDTH, 416)
-    camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 416)
-    camera.set(cv2.CAP_PROP_FPS, 15)
-    camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-    
     classNames = ["pothole"]
-    m = get_model()
-    frame_count = 0
-    skip_frames = 2
     
-    while True:
-        success, frame = camera.read()
-        if not success:
-            break
-        
-        frame_count += 1
+    # One device->host transfer per frame instead of several per box
+    xyxy = boxes.xyxy.cpu().numpy().astype(np.int32)
+    conf_pcts = np.rint(boxes.conf.cpu().numpy() * 100).astype(np.int32).tolist()
+    clss = boxes.cls.cpu().numpy().astype(np.int32)
+    
+    for (x1, y1, x2, y2), conf_pct, cls in zip(xyxy, conf_pcts, clss):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), BOX_COLOR, 3)
         
-        if frame_count % skip_frames == 0:
-            results = m(frame, stream=True, conf=DETECTION_CONFIDENCE, iou=0.5, 
-                       imgsz=416, half=False, verbose=False)
-        else:
-            results = []
+        class_name = classNames[cls]
+        label, t_size = detection_label(class_name, conf_pct)
+        c2 = x1 + t_size[0], y1 - t_size[1] - 3
+        cv2.rectangle(frame, (x1, y1), c2, BOX_COLOR, -1, cv2.LINE_AA)
+        cv2.putText(frame, label, (x1, y1 - 2), 0, 1, TEXT_COLOR, thickness=1, lineType=cv2.LINE_AA)
         
-        for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 255), 3)
-                
-                conf = math.ceil((box.conf[0] * 100)) / 100
-                cls = int(box.cls[0])
-                class_name = classNames[cls]
-                label = f'{class_name} {conf}'
+        current_time = time.monotonic()
+        if current_time - last_capture_time > CAPTURE_COOLDOWN:
+            last_capture_time = current_time
+            lat = latest_location.get('latitude', 0)
+            lng = latest_location.get('longitude', 0)
+            
+            # Copy so the stream can keep drawing on and encoding this frame
+            try:
+                post_q.put_nowait((frame.copy(), class_name, conf_pct / 100, lat, lng))
+            except queue.Full:
+                print("Post-processing queue full, dropping snapshot")
+    
+    return frame
+
+MJPEG_PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+class CameraSource:
+    """One camera + inference pipeline whose annotated JPEG frames are shared by all /video_feed clients"""
+    
+    def __init__(self, source=0):
+        self.source = source
+        self.condition = threading.Condition()
+        self.latest_jpeg = None
+        self.frame_id = 0
+        self.clients = 0
+        self.running = False
+    
+    def start(self):
+        self.running = True
+        threading.Thread(target=self.run, daemon=True).start()
+    
+    def run(self):
+        """Stage 3: draw detections and encode JPEG, publishing each frame to waiting clients"""
+        camera = None
+        workers = []
+        stop_event = threading.Event()
+        clean_stop = False
+        try:
+            camera = open_video_capture(self.source)
+            if not camera.isOpened():
+                raise RuntimeError(f"Cannot open video source: {self.source}")
+            camera.set(cv2.CAP_PROP_FRAME_WIDTH, 416)
+            camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 416)
+            camera.set(cv2.CAP_PROP_FPS, 15)
+            camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            
+            m = get_model()
+            
+            # Bounded queues keep at most one batch of frames in flight
+            queue_size = max(PIPELINE_QUEUE_SIZE, PIPELINE_BATCH_SIZE)
+            capture_q = queue.Queue(maxsize=queue_size)
+            infer_q = queue.Queue(maxsize=queue_size)
+            workers = [
+                threading.Thread(target=capture_worker, args=(camera, capture_q, stop_event), daemon=True),
+                threading.Thread(target=inference_worker, args=(m, capture_q, infer_q, stop_event), daemon=True)
+            ]
+            for worker in workers:
+                worker.start()
+            
+            # Keep the camera open only while someone is watching
+            while self.clients > 0:
+                try:
+                    item = infer_q.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    break  # camera or inference stopped
                 
-                t_size = cv2.getTextSize(label, 0, fontScale=1, thickness=2)[0]
-                c2 = x1 + t_size[0], y1 - t_size[1] - 3
-                cv2.rectangle(frame, (x1, y1), c2, [255, 0, 255], -1, cv2.LINE_AA)
-                cv2.putText(frame, label, (x1, y1 - 2), 0, 1, [255, 255, 255], thickness=1, lineType=cv2.LINE_AA)
+                frame = annotate_frame(*item)
+                jpeg = encode_jpeg(frame, quality=70)
                 
-                current_time = datetime.now().timestamp()
-                if current_time - last_capture_time > CAPTURE_COOLDOWN:
-                    last_capture_time = current_time
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                    filename = f'pothole_{timestamp}.jpg'
-                    filepath = os.path.join(DASHCAM_FOLDER, filename)
-                    cv2.imwrite(filepath, frame)
-                    
-                    lat = latest_location.get('latitude', 0)
-                    lng = latest_location.get('longitude', 0)
-                    
-                    detection_id = add_detection(filepath, lat or 0, lng or 0, class_name, float(conf))
-                    
-                    socketio.emit('detection_alert', {
-                        'id': detection_id,
-                        'timestamp': timestamp,
-                        'confidence': float(conf),
-                        'type': class_name,
-                        'location': f"{lat}, {lng}" if lat and lng else "Unknown"
-                    })
-        
-        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 70]
-        ret, buffer = cv2.imencode('.jpg', frame, encode_param)
-        frame = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+                with self.condition:
+                    self.latest_jpeg = jpeg
+                    self.frame_id += 1
+                    self.condition.notify_all()
+                # Give waiting clients a turn before the next frame (needed with eventlet's green threads)
+                time.sleep(0)
+            else:
+                clean_stop = True  # the last client left
+        except Exception as e:
+            print(f"Camera pipeline error: {e}")
+        finally:
+            stop_event.set()
+            for worker in workers:
+                worker.join(timeout=1)
+            if camera is not None:
+                camera.release()
+            
+            with self.condition:
+                self.latest_jpeg = None
+                # A client may have connected while we were shutting down; after a failure, waiting
+                # clients are released instead so a persistent error can't spin in a restart loop
+                if self.clients > 0 and clean_stop:
+                    self.start()
+                else:
+                    self.running = False
+                self.condition.notify_all()
     
-    camera.release()
+    def frames(self):
+        """MJPEG generator for a single client"""
+        with self.condition:
+            self.clients += 1
+            if not self.running:
+                self.start()
+            # Hand a newly connected client the current frame straight away
+            last_id = self.frame_id - 1 if self.latest_jpeg is not None else self.frame_id
+        
+        try:
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.frame_id != last_id or not self.running)
+                    if self.frame_id == last_id or self.latest_jpeg is None:
+                        break
+                    frame, last_id = self.latest_jpeg, self.frame_id
+                
+                # Yield the shared JPEG as-is rather than concatenating a per-client copy
+                yield MJPEG_PART_HEADER
+                yield frame
+                yield b'\r\n'
+        finally:
+            with self.condition:
+                self.clients -= 1
+
+camera_source = CameraSource(CAMERA_SOURCE)
+
+def generate_frames():
+    return camera_source.frames()
+
+# Background pool for writing captured images to disk
+io_executor = ThreadPoolExecutor(max_workers=2)
+
+def save_image_bytes(filepath, image_bytes):
+    with open(filepath, 'wb') as f:
+        f.write(image_bytes)
 
 @app.route('/capture_detection', methods=['POST'])
 def capture_detection():
@@ -242,31 +578,34 @@ def capture_detection():
         image_data = image_data.split(',')[1]
         image_bytes = base64.b64decode(image_data)
         
+        # Decode once in memory instead of writing to disk and re-reading the file
+        img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("Could not decode image")
+        
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'pothole_{timestamp}.jpg'
         filepath = os.path.join(DASHCAM_FOLDER, filename)
         
-        with open(filepath, 'wb') as f:
-            f.write(image_bytes)
+        # Every capture is kept, as before; the write overlaps inference
+        saved = io_executor.submit(save_image_bytes, filepath, image_bytes)
         
-        m = get_model()
-        results = m.predict(filepath, conf=0.5)
+        result = predict_batched(img, 0.5)
         
         detection_info = []
-        for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-                detection_type = "pothole"
-                
-                add_detection(filepath, latitude, longitude, detection_type, conf)
-                
-                detection_info.append({
-                    'type': detection_type,
-                    'confidence': conf,
-                    'timestamp': timestamp
-                })
+        # One device->host transfer for all confidences instead of one per box
+        for conf in result.boxes.conf.cpu().numpy().tolist():
+            detection_type = "pothole"
+            
+            add_detection(filepath, latitude, longitude, detection_type, conf)
+            
+            detection_info.append({
+                'type': detection_type,
+                'confidence': conf,
+                'timestamp': timestamp
+            })
+        
+        saved.result()  # the file exists once we hand out its path
         
         return jsonify({
             'success': True,
@@ -340,9 +679,26 @@ def api_chat():
         print(f"Chat error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def api_chat_stream():
+    """Chat endpoint that streams the answer as newline-delimited JSON events while it is generated"""
+    data = request.json
+    user_message = data.get('message', '')
+    history = data.get('history', [])
+    
+    def generate():
+        try:
+            for event in stream_chat_message(user_message, history):
+                yield json.dumps(event) + '\n'
+        except Exception as e:
+            print(f"Chat error: {e}")
+            yield json.dumps({'success': False, 'error': str(e)}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/update-fix', methods=['POST'])
 def api_update_fix():
-    """Fix a detection - moves it from detections.csv to repairs.csv"""
+    """Fix a detection - moves it from the detections table to the repairs table"""
     try:
         data = request.json
         detection_id = int(data.get('detection_id'))
@@ -377,8 +733,7 @@ def api_stats():
 def api_get_detection(detection_id):
     """Get a specific detection by ID"""
     try:
-        detections = get_all_detections()
-        detection = next((d for d in detections if d['id'] == detection_id), None)
+        detection = get_detection_by_id(detection_id)
         if detection:
             return jsonify({'success': True, 'detection': detection})
         else:
@@ -390,56 +745,54 @@ def api_get_detection(detection_id):
 def api_get_by_risk(risk_level):
     """Get detections filtered by risk level"""
     try:
-        detections = get_all_detections()
-        
-        if risk_level == 'high':
-            filtered = [d for d in detections if d['confidence'] >= 0.8]
-        elif risk_level == 'medium':
-            filtered = [d for d in detections if 0.5 <= d['confidence'] < 0.8]
-        elif risk_level == 'low':
-            filtered = [d for d in detections if d['confidence'] < 0.5]
-        else:
-            filtered = detections
+        filtered = get_detections_by_risk(risk_level)
         
         return jsonify({
             'success': True, 
             'risk_level': risk_level,
             'count': len(filtered),
-            'detections': sorted(filtered, key=lambda x: -x['confidence'])
+            'detections': filtered
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/download-report')
 def api_download_report():
-    """Generate and download report CSV"""
+    """Stream the report CSV to the client row by row"""
     try:
         stats = get_detection_stats()
-        detections = get_all_detections()
+        generated = datetime.now()
         
-        report_file = 'report_' + datetime.now().strftime('%Y%m%d_%H%M%S') + '.csv'
-        report_path = os.path.join('static', report_file)
+        def report_rows():
+            yield ['Pothole Detection System - Report']
+            yield ['Generated:', generated.strftime('%Y-%m-%d %H:%M:%S')]
+            yield []
+            yield ['Summary Statistics']
+            yield ['Total Detections', stats['total_detections']]
+            yield ['Potholes', stats['total_potholes']]
+            yield ['Cracks', stats['total_cracks']]
+            yield ['Average Confidence', f"{stats['avg_confidence']}%"]
+            yield ['High Severity', stats['high_severity']]
+            yield ['Medium Severity', stats['medium_severity']]
+            yield ['Low Severity', stats['low_severity']]
+            yield []
+            yield ['Detailed Detections']
+            yield ['ID', 'Type', 'Confidence', 'Latitude', 'Longitude', 'Timestamp']
+            for d in iter_detections():
+                yield [d['id'], d['type'], d['confidence'], d['lat'], d['lng'], d['timestamp']]
         
-        with open(report_path, 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(['Pothole Detection System - Report'])
-            writer.writerow(['Generated:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
-            writer.writerow([])
-            writer.writerow(['Summary Statistics'])
-            writer.writerow(['Total Detections', stats['total_detections']])
-            writer.writerow(['Potholes', stats['total_potholes']])
-            writer.writerow(['Cracks', stats['total_cracks']])
-            writer.writerow(['Average Confidence', f"{stats['avg_confidence']}%"])
-            writer.writerow(['High Severity', stats['high_severity']])
-            writer.writerow(['Medium Severity', stats['medium_severity']])
-            writer.writerow(['Low Severity', stats['low_severity']])
-            writer.writerow([])
-            writer.writerow(['Detailed Detections'])
-            writer.writerow(['ID', 'Type', 'Confidence', 'Latitude', 'Longitude', 'Timestamp'])
-            for d in detections:
-                writer.writerow([d['id'], d['type'], d['confidence'], d['lat'], d['lng'], d['timestamp']])
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in report_rows():
+                writer.writerow(row)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
         
-        return send_from_directory('static', report_file, as_attachment=True)
+        report_file = 'report_' + generated.strftime('%Y%m%d_%H%M%S') + '.csv'
+        return Response(generate(), mimetype='text/csv',
+                       headers={'Content-Disposition': f'attachment; filename={report_file}'})
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -452,15 +805,16 @@ def api_get_path():
         count = data.get('count', 10)
         detection_type = data.get('type', 'all')
         
-        detections = get_all_detections()
+        detections = iter_detections()
         
         if detection_type != 'all':
-            detections = [d for d in detections if d['type'].lower() == detection_type.lower()]
+            detections = (d for d in detections if d['type'].lower() == detection_type.lower())
         
-        priority_detections = sorted(detections, key=lambda x: -x['confidence'])[:count]
+        # Keep only the top `count` while streaming instead of sorting every detection
+        priority_detections = heapq.nlargest(count, detections, key=lambda x: x['confidence'])
         
         if priority_detections:
-            path_order, total_dist = nearest_neighbor_path(priority_detections)
+            path_order, total_dist = nearest_neighbor_path_multistart(coords_array(priority_detections))
             ordered_points = [priority_detections[i] for i in path_order]
             route_polyline = [[p['lat'], p['lng']] for p in ordered_points]
             
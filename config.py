@@ -10,21 +10,63 @@ import os
 GROQ_API_KEY = os.environ.get('GROQ_API_KEY', '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')
 GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
 GROQ_MODEL = "llama-3.3-70b-versatile"
+GROQ_MAX_RETRIES = 2  # retries on rate limits (429) and server errors, with backoff
+LLM_CACHE_SIZE = 256  # chat answers kept for repeated questions
+CHAT_SNAPSHOT_WINDOW = 0.02  # seconds concurrent chats share one database read
 
 # Flask Configuration
 SECRET_KEY = os.environ.get('SECRET_KEY', 'pothole-detection-secret')
 DEBUG = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
 
+# Socket.IO server settings
+# eventlet (monkey-patched at startup) by default; set to 'threading' to use the Werkzeug dev server.
+# Running more than one gunicorn worker needs a shared message queue, e.g. redis://localhost:6379/0
+SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE', 'eventlet')
+SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None
+
 # File paths
 UPLOAD_FOLDER = "static/uploads"
 RESULT_FOLDER = "static/results"
 DASHCAM_FOLDER = "static/dashcam_captures"
-DETECTIONS_CSV = "detections.csv"
+DATABASE_PATH = "detections.db"
+DETECTIONS_CSV = "detections.csv"  # imported into the database on first run
 REPAIRS_CSV = "repairs.csv"
 
+# Model settings
+MODEL_WEIGHTS = "best.pt"
+MODEL_ENGINE = "best.engine"  # TensorRT engine, exported next to the weights on first load
+MODEL_OPENVINO = "best_openvino_model"  # INT8 OpenVINO export used on CPU-only hosts (needs openvino installed)
+MODEL_IMGSZ = 416  # input size the engine is exported and tuned for
+MODEL_MAX_BATCH = 8  # largest batch the dynamic engine accepts
+MODEL_CALIB_DATA = "calib.yaml"  # INT8 calibration images for the engine export
+MODEL_WORKSPACE = 4  # GiB of GPU memory TensorRT may use while building the engine (Ultralytics 8.3 also scales the largest dynamic input by it)
+
 # Detection settings
 DETECTION_CONFIDENCE = 0.4
+HIGH_RISK_CONFIDENCE = 0.8  # confidence at or above this is high risk
+MEDIUM_RISK_CONFIDENCE = 0.5  # confidence at or above this (and below high) is medium risk
 CAPTURE_COOLDOWN = 5  # seconds between automatic captures
+STATS_CACHE_TTL = 60  # max seconds unchanged statistics are reused (today/week counts roll over with the clock)
+GEOLOCATION_CACHE_TTL = 600  # seconds an IP-based location is reused
+ROUTE_STARTS = 8  # nearest-neighbor tours tried per repair route (shortest one is used)
+ROUTE_CACHE_SIZE = 32  # recent repair routes kept for repeated requests over the same points
+
+# Live video pipeline
+# Camera for /video_feed: a device index, or a GStreamer pipeline ending in a BGR appsink, e.g. on Jetson:
+#   v4l2src device=/dev/video0 ! image/jpeg,width=416,height=416 ! nvv4l2decoder mjpeg=1 ! nvvidconv !
+#   video/x-raw,format=BGRx ! videoconvert ! video/x-raw,format=BGR ! appsink drop=true max-buffers=1
+CAMERA_SOURCE = os.environ.get('CAMERA_SOURCE', '0')
+CAMERA_SOURCE = int(CAMERA_SOURCE) if CAMERA_SOURCE.isdigit() else CAMERA_SOURCE
+DASHCAM_IMGSZ = 320  # smaller input for the live feed; the dynamic engine's profile spans 32 px to max(2, MODEL_WORKSPACE) x MODEL_IMGSZ
+DASHCAM_MAX_DET = 10  # cap on boxes per live frame
+PIPELINE_QUEUE_SIZE = 2  # max frames buffered between capture, inference and encoding
+PIPELINE_BATCH_SIZE = 4  # frames coalesced into one forward pass
+PIPELINE_BATCH_TIMEOUT = 0.005  # seconds to wait for a batch to fill
+POST_QUEUE_SIZE = 8  # pending snapshots waiting to be saved and announced
+SNAPSHOT_JPEG_QUALITY = 85
+
+# Uploaded image detection
+PREDICT_BATCH_WINDOW = 0.02  # seconds to wait for concurrent requests to share a forward pass
 
 # Create directories if they don't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
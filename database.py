@@ -1,53 +1,136 @@
-# Database operations for detections and repairs CSV files
-# Handles all CSV read/write operations for the Pothole Detection System
+# Database operations for detections and repairs
+# SQLite (WAL) storage for the Pothole Detection System; the CSV files only seed an empty database
 # Author: Hasan Nayon
 
 import csv
 import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
 from datetime import datetime, timedelta
-from config import DETECTIONS_CSV, REPAIRS_CSV
-
-def init_csv_files():
-    """Initialize CSV files with headers if they don't exist"""
-    if not os.path.exists(DETECTIONS_CSV):
-        with open(DETECTIONS_CSV, 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(['ID', 'Timestamp', 'Image_Path', 'Latitude', 'Longitude', 'Detection_Type', 'Confidence'])
-    
-    if not os.path.exists(REPAIRS_CSV):
-        with open(REPAIRS_CSV, 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(['ID', 'Timestamp', 'Image_Path', 'Latitude', 'Longitude', 'Detection_Type', 'Confidence', 'Repair_Date', 'Technician', 'Notes'])
-
-def get_next_detection_id():
-    """Get the next available detection ID"""
-    max_id = 0
-    for csv_file in [DETECTIONS_CSV, REPAIRS_CSV]:
-        if os.path.exists(csv_file):
-            with open(csv_file, 'r') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    try:
-                        id_val = int(row.get('ID', 0))
-                        if id_val > max_id:
-                            max_id = id_val
-                    except:
-                        pass
-    return max_id + 1
+from config import (
+    DATABASE_PATH, DETECTIONS_CSV, REPAIRS_CSV,
+    HIGH_RISK_CONFIDENCE, MEDIUM_RISK_CONFIDENCE, STATS_CACHE_TTL
+)
 
-def add_detection(image_path, latitude, longitude, detection_type, confidence):
-    """Add a new detection to detections.csv"""
-    detection_id = get_next_detection_id()
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    with open(DETECTIONS_CSV, 'a', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow([detection_id, timestamp, image_path, latitude, longitude, detection_type, confidence])
+# Column names double as the keys of the detection/repair dicts used throughout the app
+DETECTION_COLUMNS = "id, timestamp, image_path, lat, lng, type, confidence"
+REPAIR_COLUMNS = DETECTION_COLUMNS + ", repair_date, technician, notes"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    image_path TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lng REAL NOT NULL,
+    type TEXT NOT NULL,
+    confidence REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_detections_confidence ON detections (confidence DESC, id);
+CREATE INDEX IF NOT EXISTS idx_detections_type ON detections (type);
+
+-- Implicit rowid keeps repairs in the order they were made
+CREATE TABLE IF NOT EXISTS repairs (
+    id INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    image_path TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lng REAL NOT NULL,
+    type TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    repair_date TEXT NOT NULL,
+    technician TEXT NOT NULL DEFAULT '',
+    notes TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_repairs_id ON repairs (id);
+"""
+
+_local = threading.local()
+_write_q = queue.Queue()
+_writer_lock = threading.Lock()
+_writer_thread = None
+WRITE_BATCH_SIZE = 64  # most queued writes committed together
+
+# get_detection_stats() result, reused for STATS_CACHE_TTL seconds or until the database changes
+_stats_cache = {'time': 0.0, 'value': None, 'generation': 0, 'data_version': None}
+_stats_lock = threading.Lock()
+_stats_conn = None
+
+def _connect(check_same_thread=True):
+    conn = sqlite3.connect(DATABASE_PATH, timeout=30, check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+def _get_conn():
+    """Per-thread read connection (WAL lets readers run alongside the writer)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = _connect()
+    return conn
+
+def _writer_loop():
+    conn = _connect()
+    while True:
+        # Group commit: everything queued while the last commit ran shares one transaction,
+        # each write in its own savepoint so a failing one doesn't take the others with it
+        pending = [_write_q.get()]
+        while len(pending) < WRITE_BATCH_SIZE:
+            try:
+                pending.append(_write_q.get_nowait())
+            except queue.Empty:
+                break
+        
+        outcomes = []
+        conn.execute('BEGIN')
+        for func, args, future in pending:
+            conn.execute('SAVEPOINT write')
+            try:
+                outcomes.append((future, func(conn, *args), None))
+                conn.execute('RELEASE write')
+            except Exception as e:
+                conn.execute('ROLLBACK TO write')
+                conn.execute('RELEASE write')
+                outcomes.append((future, None, e))
+        
+        try:
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            outcomes = [(future, None, e) for future, result, error in outcomes]
+        
+        # Only report success once the data is committed
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+def _write(func, *args):
+    """Run func(conn, *args) in one transaction on the single background writer thread"""
+    global _writer_thread
+    if _writer_thread is None:
+        with _writer_lock:
+            if _writer_thread is None:
+                _writer_thread = threading.Thread(target=_writer_loop, daemon=True)
+                _writer_thread.start()
     
-    return detection_id
+    future = Future()
+    _write_q.put((func, args, future))
+    return future.result()
 
-def get_all_detections():
-    """Read all active detections from detections.csv"""
+def _to_float(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def read_csv_detections():
+    """Read detections from detections.csv"""
     detections = []
     if os.path.exists(DETECTIONS_CSV):
         with open(DETECTIONS_CSV, 'r') as file:
@@ -67,8 +150,8 @@ def get_all_detections():
                     print(f"Error parsing detection: {e}")
     return detections
 
-def get_all_repairs():
-    """Read all repairs from repairs.csv"""
+def read_csv_repairs():
+    """Read repairs from repairs.csv"""
     repairs = []
     if os.path.exists(REPAIRS_CSV):
         with open(REPAIRS_CSV, 'r') as file:
@@ -91,69 +174,199 @@ def get_all_repairs():
                     print(f"Error parsing repair: {e}")
     return repairs
 
-def move_to_repairs(detection_id, technician='', notes=''):
-    """Move a detection from detections.csv to repairs.csv"""
-    detections = get_all_detections()
-    detection = next((d for d in detections if d['id'] == detection_id), None)
+def init_database():
+    """Create the SQLite tables, importing the CSV files the first time"""
+    conn = _connect()
+    try:
+        with conn:
+            conn.executescript(SCHEMA)
+        
+        is_empty = conn.execute(
+            'SELECT NOT EXISTS (SELECT 1 FROM detections) AND NOT EXISTS (SELECT 1 FROM repairs)'
+        ).fetchone()[0]
+        if is_empty:
+            with conn:
+                conn.executemany(
+                    f'INSERT OR IGNORE INTO detections ({DETECTION_COLUMNS}) '
+                    'VALUES (:id, :timestamp, :image_path, :lat, :lng, :type, :confidence)',
+                    read_csv_detections()
+                )
+                conn.executemany(
+                    f'INSERT INTO repairs ({REPAIR_COLUMNS}) '
+                    'VALUES (:id, :timestamp, :image_path, :lat, :lng, :type, :confidence, '
+                    ':repair_date, :technician, :notes)',
+                    read_csv_repairs()
+                )
+    finally:
+        conn.close()
+
+def get_next_detection_id(conn=None):
+    """Get the next available detection ID (IDs are never reused once repaired)"""
+    conn = conn or _get_conn()
+    row = conn.execute(
+        'SELECT MAX(m) FROM (SELECT MAX(id) AS m FROM detections UNION ALL SELECT MAX(id) FROM repairs)'
+    ).fetchone()
+    return (row[0] or 0) + 1
+
+def add_detection(image_path, latitude, longitude, detection_type, confidence):
+    """Add a new detection to the database"""
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def insert(conn):
+        detection_id = get_next_detection_id(conn)
+        conn.execute(
+            f'INSERT INTO detections ({DETECTION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (detection_id, timestamp, image_path, _to_float(latitude), _to_float(longitude),
+             detection_type, float(confidence))
+        )
+        return detection_id
     
-    if not detection:
-        return False, "Detection not found"
+    detection_id = _write(insert)
+    invalidate_stats_cache()
+    return detection_id
+
+def iter_detections(limit=None):
+    """Yield active detections one at a time (oldest id first), without building a list"""
+    rows = _get_conn().execute(
+        f'SELECT {DETECTION_COLUMNS} FROM detections ORDER BY id LIMIT ?', (-1 if limit is None else limit,)
+    )
+    for row in rows:
+        yield dict(row)
+
+def get_top_detections_by_confidence(k):
+    """The k most confident active detections, highest first (ties by id)"""
+    rows = _get_conn().execute(
+        f'SELECT {DETECTION_COLUMNS} FROM detections ORDER BY confidence DESC, id LIMIT ?', (k,)
+    )
+    return [dict(row) for row in rows]
+
+def get_detection_by_id(detection_id):
+    """Get a single active detection, or None"""
+    row = _get_conn().execute(
+        f'SELECT {DETECTION_COLUMNS} FROM detections WHERE id = ?', (detection_id,)
+    ).fetchone()
+    return dict(row) if row else None
+
+def get_detections_by_risk(risk_level, limit=None):
+    """Get detections for a risk level, highest confidence first (at most `limit`)"""
+    if risk_level == 'high':
+        where, params = 'WHERE confidence >= ?', (HIGH_RISK_CONFIDENCE,)
+    elif risk_level == 'medium':
+        where, params = 'WHERE confidence >= ? AND confidence < ?', (MEDIUM_RISK_CONFIDENCE, HIGH_RISK_CONFIDENCE)
+    elif risk_level == 'low':
+        where, params = 'WHERE confidence < ?', (MEDIUM_RISK_CONFIDENCE,)
+    else:
+        where, params = '', ()
     
-    # Add to repairs.csv
+    rows = _get_conn().execute(
+        f'SELECT {DETECTION_COLUMNS} FROM detections {where} ORDER BY confidence DESC, id LIMIT ?',
+        params + (-1 if limit is None else limit,)
+    )
+    return [dict(row) for row in rows]
+
+def get_recent_repairs(k):
+    """The last k repairs, oldest first"""
+    rows = _get_conn().execute(f'SELECT {REPAIR_COLUMNS} FROM repairs ORDER BY rowid DESC LIMIT ?', (k,)).fetchall()
+    return [dict(row) for row in reversed(rows)]
+
+def move_to_repairs(detection_id, technician='', notes=''):
+    """Move a detection from the detections table to the repairs table"""
     repair_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    with open(REPAIRS_CSV, 'a', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow([
-            detection['id'],
-            detection['timestamp'],
-            detection['image_path'],
-            detection['lat'],
-            detection['lng'],
-            detection['type'],
-            detection['confidence'],
-            repair_date,
-            technician,
-            notes
-        ])
+
+    def move(conn):
+        moved = conn.execute(
+            f'INSERT INTO repairs ({REPAIR_COLUMNS}) '
+            f'SELECT {DETECTION_COLUMNS}, ?, ?, ? FROM detections WHERE id = ?',
+            (repair_date, technician, notes, detection_id)
+        ).rowcount
+        if not moved:
+            return None
+        
+        conn.execute('DELETE FROM detections WHERE id = ?', (detection_id,))
+        return conn.execute('SELECT type FROM repairs WHERE rowid = last_insert_rowid()').fetchone()[0]
     
-    # Remove from detections.csv
-    remaining = [d for d in detections if d['id'] != detection_id]
-    with open(DETECTIONS_CSV, 'w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(['ID', 'Timestamp', 'Image_Path', 'Latitude', 'Longitude', 'Detection_Type', 'Confidence'])
-        for d in remaining:
-            writer.writerow([d['id'], d['timestamp'], d['image_path'], d['lat'], d['lng'], d['type'], d['confidence']])
+    detection_type = _write(move)
+    if detection_type is None:
+        return False, "Detection not found"
     
-    return True, f"{detection['type'].title()} #{detection_id} has been fixed!"
+    invalidate_stats_cache()
+    return True, f"{detection_type.title()} #{detection_id} has been fixed!"
+
+def invalidate_stats_cache():
+    """Drop the cached statistics after the detections or repairs change"""
+    with _stats_lock:
+        _stats_cache['value'] = None
+        _stats_cache['generation'] += 1
+
+def _data_version():
+    """SQLite's change counter: moves whenever another connection (or process) commits; call with _stats_lock held"""
+    global _stats_conn
+    if _stats_conn is None:
+        _stats_conn = _connect(check_same_thread=False)
+    return _stats_conn.execute('PRAGMA data_version').fetchone()[0]
+
+def get_data_version():
+    """Token that changes whenever detections or repairs are written, by this or another process"""
+    with _stats_lock:
+        return _stats_cache['generation'], _data_version()
 
 def get_detection_stats():
-    """Calculate detection statistics from both CSVs"""
-    detections = get_all_detections()
-    repairs = get_all_repairs()
+    """Detection statistics, cached until the database changes (or STATS_CACHE_TTL passes, for the date counts)"""
+    with _stats_lock:
+        data_version = _data_version()
+        if (_stats_cache['value'] is not None and _stats_cache['data_version'] == data_version
+                and time.monotonic() - _stats_cache['time'] < STATS_CACHE_TTL):
+            return _stats_cache['value']
+        generation = _stats_cache['generation']
     
+    stats = calculate_detection_stats()
+    
+    with _stats_lock:
+        # Don't cache a result computed while a write was landing
+        if _stats_cache['generation'] == generation:
+            _stats_cache.update(time=time.monotonic(), value=stats, data_version=data_version)
+    return stats
+
+def calculate_detection_stats():
+    """Calculate detection statistics from detections and repairs"""
     today = datetime.now().date()
     week_ago = today - timedelta(days=7)
     
-    # Count by type
-    total_potholes = sum(1 for d in detections if d['type'].lower() == 'pothole')
-    total_cracks = sum(1 for d in detections if d['type'].lower() == 'crack')
-    
-    # Fixed counts
-    fixed_potholes = sum(1 for r in repairs if r['type'].lower() == 'pothole')
-    fixed_cracks = sum(1 for r in repairs if r['type'].lower() == 'crack')
+    conn = _get_conn()
+    detections = conn.execute(
+        """SELECT COUNT(*) AS total,
+                  TOTAL(lower(type) = 'pothole') AS potholes,
+                  TOTAL(lower(type) = 'crack') AS cracks,
+                  TOTAL(confidence * 100) AS confidence_pct,
+                  TOTAL(confidence >= :high) AS high,
+                  TOTAL(confidence >= :medium AND confidence < :high) AS medium,
+                  TOTAL(confidence < :medium) AS low,
+                  TOTAL(substr(timestamp, 1, 10) = :today) AS today,
+                  TOTAL(substr(timestamp, 1, 10) >= :week_ago) AS week
+           FROM detections""",
+        {'high': HIGH_RISK_CONFIDENCE, 'medium': MEDIUM_RISK_CONFIDENCE,
+         'today': str(today), 'week_ago': str(week_ago)}
+    ).fetchone()
+    repairs = conn.execute(
+        """SELECT COUNT(*) AS total,
+                  TOTAL(lower(type) = 'pothole') AS potholes,
+                  TOTAL(lower(type) = 'crack') AS cracks
+           FROM repairs"""
+    ).fetchone()
     
+    total = detections['total']
     stats = {
-        'total_detections': len(detections),
-        'total_potholes': total_potholes,
-        'total_cracks': total_cracks,
-        'fixed_count': len(repairs),
-        'fixed_potholes': fixed_potholes,
-        'fixed_cracks': fixed_cracks,
-        'avg_confidence': round(sum(d['confidence'] * 100 for d in detections) / len(detections), 1) if detections else 0,
-        'high_severity': sum(1 for d in detections if d['confidence'] >= 0.8),
-        'medium_severity': sum(1 for d in detections if 0.5 <= d['confidence'] < 0.8),
-        'low_severity': sum(1 for d in detections if d['confidence'] < 0.5),
-        'today_count': sum(1 for d in detections if d['timestamp'].startswith(str(today))),
-        'week_count': len([d for d in detections if d['timestamp'][:10] >= str(week_ago)])
+        'total_detections': total,
+        'total_potholes': int(detections['potholes']),
+        'total_cracks': int(detections['cracks']),
+        'fixed_count': repairs['total'],
+        'fixed_potholes': int(repairs['potholes']),
+        'fixed_cracks': int(repairs['cracks']),
+        'avg_confidence': round(detections['confidence_pct'] / total, 1) if total else 0,
+        'high_severity': int(detections['high']),
+        'medium_severity': int(detections['medium']),
+        'low_severity': int(detections['low']),
+        'today_count': int(detections['today']),
+        'week_count': int(detections['week'])
     }
     return stats
@@ -2,57 +2,245 @@
 # Provides AI chatbot capabilities for the Pothole Detection System
 # Author: Hasan Nayon
 
+import asyncio
 import re
-import requests
-from config import GROQ_API_KEY, GROQ_API_URL, GROQ_MODEL
-from database import get_all_detections, get_all_repairs, get_detection_stats
-from utils import nearest_neighbor_path
+from collections import OrderedDict
+import httpx
 
-def call_groq_llm(messages, system_prompt=None):
+try:
+    import orjson
+    json_dumps, json_loads = orjson.dumps, orjson.loads
+except ImportError:  # stdlib json is slower but produces the same payload
+    import json
+    json_dumps, json_loads = lambda obj: json.dumps(obj).encode(), json.loads
+from config import GROQ_API_KEY, GROQ_API_URL, GROQ_MODEL, GROQ_MAX_RETRIES, LLM_CACHE_SIZE, CHAT_SNAPSHOT_WINDOW
+from database import (
+    get_data_version, get_detection_stats, get_detection_by_id, get_detections_by_risk,
+    get_top_detections_by_confidence, get_recent_repairs, iter_detections
+)
+from utils import coords_array, nearest_neighbor_path_multistart, get_event_loop, run_async
+
+# Groq calls run on the shared background event loop (see utils.get_event_loop) with a
+# keep-alive AsyncClient, so concurrent chats overlap their network waits instead of each blocking a worker
+_client = None
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MESSAGE_KEYS = frozenset({'role', 'content'})
+
+# Last system prompt and the data snapshot it was built from
+_prompt_cache = (None, None)
+
+# Answers to recent questions, keyed on (intent, data snapshot, conversation so far, normalized words);
+# only touched from the background loop, so no lock is needed
+_response_cache = OrderedDict()
+
+# (start time, task) of the newest database read shared by concurrent chats
+_snapshot = None
+
+# UI content for recent messages, keyed on (message, data version, stats); loop-only like _response_cache
+_content_cache = OrderedDict()
+CONTENT_CACHE_SIZE = 256
+
+# Intent patterns in priority order, compiled once; the first one found in the message wins
+INTENT_PATTERNS = tuple((name, re.compile(pattern)) for name, pattern in (
+    ('specific', r'(show|view|display|see|find|get)\s*(me\s*)?(pothole|crack|detection|defect|id)\s*#?(?P<detection_id>\d+)'),
+    ('high', r'(show|list|get|find|display|what|which).*(high|critical|urgent|dangerous|severe)\s*(risk|priority|severity)?'),
+    ('medium', r'(show|list|get|find|display|what|which).*(medium|moderate|middle)\s*(risk|priority|severity)?'),
+    ('low', r'(show|list|get|find|display|what|which).*(low|minor|small)\s*(risk|priority|severity)?'),
+    ('report', r'(report|summary|overview|statistics|stats|total|count|how many)'),
+    ('path', r'(path|route|shortest|direction|navigate|visit|fix\s*today|repair\s*route)'),
+    ('data', r'(list|extract|export|all|data|download|priority\s*list)'),
+    ('fix', r'(fix|repair|mark|update|complete|done|finished|solved)')
+))
+NUMBER_RE = re.compile(r'\d+')
+
+# Fallback response patterns
+GREETING_RE = re.compile(r'(hello|hi|hey|good morning|good afternoon|good evening)')
+HOW_ARE_YOU_RE = re.compile(r'(how are you|how\'s it going|what\'s up)')
+HELP_RE = re.compile(r'(help|what can you do|capabilities|features)')
+THANKS_RE = re.compile(r'(thank|thanks|appreciate)')
+WORD_RE = re.compile(r"[a-z0-9']+")
+
+def get_client():
+    """Shared AsyncClient; only touched from the background loop"""
+    global _client
+    if _client is None:
+        # Pool limits go on the transport: AsyncClient ignores limits= when a transport is given
+        _client = httpx.AsyncClient(
+            timeout=30,
+            transport=httpx.AsyncHTTPTransport(
+                retries=GROQ_MAX_RETRIES,  # connect errors only
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+            )
+        )
+    return _client
+
+async def post_with_retry(url, stream=False, **kwargs):
+    """POST, retrying rate limits (429) and server errors with exponential backoff.
+
+    With stream=True the body is left unread and the caller must aclose() the response.
+    """
+    client = get_client()
+    for attempt in range(GROQ_MAX_RETRIES + 1):
+        response = await client.send(client.build_request('POST', url, **kwargs), stream=stream)
+        if response.status_code not in RETRY_STATUSES or attempt == GROQ_MAX_RETRIES:
+            return response
+        
+        if stream:
+            await response.aclose()
+        retry_after = response.headers.get('retry-after', '')
+        delay = float(retry_after) if retry_after.replace('.', '', 1).isdigit() else 0.3 * 2 ** attempt
+        await asyncio.sleep(min(delay, 10))
+
+def groq_request(messages, system_prompt=None, stream=False):
+    """Headers and payload for a chat completion, or None if no API key is configured"""
+    if not GROQ_API_KEY or GROQ_API_KEY == "your-api-key-here":
+        print("Groq API key not configured!")
+        return None
+    
+    all_messages = []
+    if system_prompt:
+        all_messages.append({"role": "system", "content": system_prompt})
+    all_messages.extend(messages)
+    
+    headers = {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    
+    payload = {
+        "model": GROQ_MODEL,
+        "messages": all_messages,
+        "temperature": 0.7,
+        "max_tokens": 2048
+    }
+    if stream:
+        payload["stream"] = True
+    return headers, payload
+
+def invalid_api_key():
+    """Explain how to replace a rejected API key"""
+    print("Groq API: Invalid API key! Please update GROQ_API_KEY in config.py")
+    print("Get a valid key from: https://console.groq.com/keys")
+
+async def acall_groq_llm(messages, system_prompt=None):
     """Call Groq LLM API"""
     try:
-        if not GROQ_API_KEY or GROQ_API_KEY == "your-api-key-here":
-            print("Groq API key not configured!")
+        request = groq_request(messages, system_prompt)
+        if request is None:
             return None
-            
-        all_messages = []
-        if system_prompt:
-            all_messages.append({"role": "system", "content": system_prompt})
-        all_messages.extend(messages)
-        
-        headers = {
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": GROQ_MODEL,
-            "messages": all_messages,
-            "temperature": 0.7,
-            "max_tokens": 2048
-        }
+        headers, payload = request
         
-        response = requests.post(GROQ_API_URL, headers=headers, json=payload, timeout=30)
+        response = await post_with_retry(GROQ_API_URL, headers=headers, content=json_dumps(payload))
         
         if response.status_code == 401:
-            print("Groq API: Invalid API key! Please update GROQ_API_KEY in config.py")
-            print("Get a valid key from: https://console.groq.com/keys")
+            invalid_api_key()
             return None
             
         response.raise_for_status()
         
-        data = response.json()
+        data = json_loads(response.content)
         return data['choices'][0]['message']['content']
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         print("Groq API: Request timed out")
         return None
     except Exception as e:
         print(f"Groq API error: {e}")
         return None
 
-def build_system_prompt(stats, detections, repairs):
+async def astream_groq_llm(messages, system_prompt=None):
+    """Call Groq LLM API in streaming (SSE) mode, yielding content deltas as they arrive.
+
+    Ends without yielding anything when no key is configured or the key is rejected. Any other
+    failure, including a stream that closes before the [DONE] sentinel, is raised to the caller.
+    """
+    request = groq_request(messages, system_prompt, stream=True)
+    if request is None:
+        return
+    headers, payload = request
+    
+    try:
+        response = await post_with_retry(GROQ_API_URL, stream=True, headers=headers, content=json_dumps(payload))
+        try:
+            if response.status_code == 401:
+                invalid_api_key()
+                return
+            
+            response.raise_for_status()
+            
+            async for line in response.aiter_lines():
+                if not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    return
+                
+                delta = json_loads(data)['choices'][0]['delta'].get('content')
+                if delta:
+                    yield delta
+            raise httpx.RemoteProtocolError("Stream closed before [DONE]")
+        finally:
+            await response.aclose()
+    except httpx.TimeoutException:
+        print("Groq API: Request timed out")
+        raise
+    except Exception as e:
+        print(f"Groq API error: {e}")
+        raise
+
+def call_groq_llm(messages, system_prompt=None):
+    """Blocking wrapper around acall_groq_llm"""
+    return run_async(acall_groq_llm(messages, system_prompt))
+
+def prompt_cache_key(stats, high_risk_samples, repairs):
+    """Snapshot of the data a system prompt depends on; changes with every detection or repair write"""
+    return (
+        tuple(stats.values()),
+        tuple(d['id'] for d in high_risk_samples),
+        tuple(r['id'] for r in repairs)
+    )
+
+def _response_key(context_key, user_message):
+    """Cache key for a question; the normalized words must match exactly (a negation or changed number is a new question)"""
+    words = WORD_RE.findall(user_message.lower())
+    return (context_key, ' '.join(words)) if words else None
+
+def get_cached_response(context_key, user_message):
+    """Answer given earlier to the same question (up to case and punctuation) about the same data, or None"""
+    key = _response_key(context_key, user_message)
+    if key not in _response_cache:
+        return None
+    
+    _response_cache.move_to_end(key)
+    return _response_cache[key]
+
+def cache_response(context_key, user_message, response):
+    """Remember an LLM answer, evicting the least recently used one past LLM_CACHE_SIZE"""
+    key = _response_key(context_key, user_message)
+    if key is None:
+        return
+    
+    _response_cache[key] = response
+    _response_cache.move_to_end(key)
+    if len(_response_cache) > LLM_CACHE_SIZE:
+        _response_cache.popitem(last=False)
+
+def build_system_prompt(stats, high_risk_samples, repairs):
+    """System prompt for the current data, reused while the data is unchanged"""
+    global _prompt_cache
+    key = prompt_cache_key(stats, high_risk_samples, repairs)
+    cached_key, prompt = _prompt_cache
+    if cached_key != key:
+        prompt = format_system_prompt(stats, high_risk_samples, repairs)
+        _prompt_cache = (key, prompt)
+    return prompt
+
+def format_system_prompt(stats, high_risk_samples, repairs):
     """Build the system prompt with current data context"""
-    high_risk_samples = [d for d in detections if d['confidence'] >= 0.8][:5]
+    high_risk_lines = "\n".join([
+        f"- ID {d['id']}: {d['type']} at ({d['lat']:.4f}, {d['lng']:.4f}), Confidence: {d['confidence']*100:.0f}%"
+        for d in high_risk_samples
+    ]) or "None"
+    repair_lines = "\n".join([f"- {r['type']} fixed on {r['repair_date']}" for r in repairs[-5:]]) or "No repairs yet"
     
     return f"""You are a specialized AI assistant ONLY for a Pothole Detection System. You MUST only answer questions related to:
 - Road damage (potholes, cracks)
@@ -79,10 +267,10 @@ def build_system_prompt(stats, detections, repairs):
 - Average Detection Confidence: {stats['avg_confidence']}%
 
 ## Sample High Risk Detections:
-{chr(10).join([f"- ID {d['id']}: {d['type']} at ({d['lat']:.4f}, {d['lng']:.4f}), Confidence: {d['confidence']*100:.0f}%" for d in high_risk_samples]) if high_risk_samples else "None"}
+{high_risk_lines}
 
 ## Recent Repairs:
-{chr(10).join([f"- {r['type']} fixed on {r['repair_date']}" for r in repairs[-5:]]) if repairs else "No repairs yet"}
+{repair_lines}
 
 ## Your Capabilities (ONLY these topics):
 1. **Answer questions** about the system, road damage, potholes, cracks
@@ -101,19 +289,38 @@ def build_system_prompt(stats, detections, repairs):
 
 Remember: You are ONLY a road damage assistant. Politely refuse ALL off-topic questions."""
 
-def detect_intent_and_content(user_message, detections, repairs, stats):
-    """Detect user intent and prepare special content for UI display"""
+def classify_intent(message_lower):
+    """(intent name, match) for the highest-priority intent pattern in the message, or (None, None)"""
+    for name, pattern in INTENT_PATTERNS:
+        match = pattern.search(message_lower)
+        if match:
+            return name, match
+    return None, None
+
+def risk_filter_content(risk_level, stats):
+    """UI content listing the 30 highest-confidence detections of one risk level"""
+    return {
+        'type': 'risk_filter',
+        'data': {
+            'risk_level': risk_level,
+            'count': stats[f'{risk_level}_severity'],
+            'detections': get_detections_by_risk(risk_level, limit=30)
+        }
+    }
+
+def detect_intent_and_content(user_message, repairs, stats):
+    """Detect user intent and prepare special content for UI display (queries only the rows it shows)"""
     content = None
     message_lower = user_message.lower()
     
+    intent_name, intent = classify_intent(message_lower)
+    
     # Check for specific detection request
-    specific_match = re.search(r'(show|view|display|see|find|get)\s*(me\s*)?(pothole|crack|detection|defect|id)\s*#?(\d+)', message_lower)
-    if specific_match:
-        detection_id = int(specific_match.group(4))
-        matching = [d for d in detections if d['id'] == detection_id]
+    if intent_name == 'specific':
+        detection_id = int(intent.group('detection_id'))
+        det = get_detection_by_id(detection_id)
         
-        if matching:
-            det = matching[0]
+        if det:
             content = {
                 'type': 'view_detection',
                 'data': {
@@ -123,52 +330,22 @@ def detect_intent_and_content(user_message, detections, repairs, stats):
             }
     
     # Check for risk level filtering
-    elif re.search(r'(show|list|get|find|display|what|which).*(high|critical|urgent|dangerous|severe)\s*(risk|priority|severity)?', message_lower):
-        high_risk = [d for d in detections if d['confidence'] >= 0.8]
-        content = {
-            'type': 'risk_filter',
-            'data': {
-                'risk_level': 'high',
-                'count': len(high_risk),
-                'detections': sorted(high_risk, key=lambda x: -x['confidence'])[:30]
-            }
-        }
-    
-    elif re.search(r'(show|list|get|find|display|what|which).*(medium|moderate|middle)\s*(risk|priority|severity)?', message_lower):
-        medium_risk = [d for d in detections if 0.5 <= d['confidence'] < 0.8]
-        content = {
-            'type': 'risk_filter',
-            'data': {
-                'risk_level': 'medium',
-                'count': len(medium_risk),
-                'detections': sorted(medium_risk, key=lambda x: -x['confidence'])[:30]
-            }
-        }
-    
-    elif re.search(r'(show|list|get|find|display|what|which).*(low|minor|small)\s*(risk|priority|severity)?', message_lower):
-        low_risk = [d for d in detections if d['confidence'] < 0.5]
-        content = {
-            'type': 'risk_filter',
-            'data': {
-                'risk_level': 'low',
-                'count': len(low_risk),
-                'detections': sorted(low_risk, key=lambda x: -x['confidence'])[:30]
-            }
-        }
+    elif intent_name in ('high', 'medium', 'low'):
+        content = risk_filter_content(intent_name, stats)
     
     # Check for report request
-    elif re.search(r'(report|summary|overview|statistics|stats|total|count|how many)', message_lower):
+    elif intent_name == 'report':
         content = {'type': 'report', 'data': stats}
     
     # Check for path/route request
-    elif re.search(r'(path|route|shortest|direction|navigate|visit|fix\s*today|repair\s*route)', message_lower):
-        numbers = re.findall(r'\d+', user_message)
+    elif intent_name == 'path':
+        numbers = NUMBER_RE.findall(user_message)
         count = int(numbers[0]) if numbers else 10
         
-        priority_detections = sorted(detections, key=lambda x: -x['confidence'])[:count]
+        priority_detections = get_top_detections_by_confidence(count)
         
         if priority_detections:
-            path_order, total_dist = nearest_neighbor_path(priority_detections)
+            path_order, total_dist = nearest_neighbor_path_multistart(coords_array(priority_detections))
             ordered_points = [priority_detections[i] for i in path_order]
             route_polyline = [[p['lat'], p['lng']] for p in ordered_points]
             
@@ -183,16 +360,16 @@ def detect_intent_and_content(user_message, detections, repairs, stats):
             }
     
     # Check for data extraction request
-    elif re.search(r'(list|extract|export|all|data|download|priority\s*list)', message_lower):
-        priority_detections = sorted(detections, key=lambda x: -x['confidence'])[:50]
+    elif intent_name == 'data':
+        priority_detections = get_top_detections_by_confidence(50)
         content = {
             'type': 'data',
             'data': {'detections': priority_detections}
         }
     
     # Check for fix/repair request
-    elif re.search(r'(fix|repair|mark|update|complete|done|finished|solved)', message_lower):
-        pending = [d for d in detections][:20]
+    elif intent_name == 'fix':
+        pending = list(iter_detections(limit=20))
         content = {
             'type': 'fix',
             'data': {
@@ -205,7 +382,7 @@ def detect_intent_and_content(user_message, detections, repairs, stats):
                         'technician': r.get('technician', ''),
                         'notes': r.get('notes', '')
                     }
-                    for r in repairs[-10:]
+                    for r in repairs
                 ],
                 'stats': stats
             }
@@ -218,104 +395,120 @@ def generate_fallback_response(user_message, stats):
     message_lower = user_message.lower()
     
     # Greeting patterns
-    if re.search(r'(hello|hi|hey|good morning|good afternoon|good evening)', message_lower):
-        fallback = f"Hello! 👋 I'm your Road Damage Assistant.\n\n"
-        fallback += f"**Current System Status:**\n"
-        fallback += f"- 🕳️ Active defects: **{stats['total_detections']}**\n"
-        fallback += f"- 🔴 High risk: {stats['high_severity']} | 🟡 Medium: {stats['medium_severity']} | 🟢 Low: {stats['low_severity']}\n"
-        fallback += f"- ✅ Already fixed: {stats['fixed_count']}\n\n"
-        fallback += "**Try asking me:**\n"
-        fallback += "• *\"Show high risk detections\"*\n"
-        fallback += "• *\"Generate a report\"*\n"
-        fallback += "• *\"Plan a repair route for 10 potholes\"*\n"
-        fallback += "• *\"I want to fix something\"*"
+    if GREETING_RE.search(message_lower):
+        lines = (
+            "Hello! 👋 I'm your Road Damage Assistant.",
+            "",
+            "**Current System Status:**",
+            f"- 🕳️ Active defects: **{stats['total_detections']}**",
+            f"- 🔴 High risk: {stats['high_severity']} | 🟡 Medium: {stats['medium_severity']} | 🟢 Low: {stats['low_severity']}",
+            f"- ✅ Already fixed: {stats['fixed_count']}",
+            "",
+            "**Try asking me:**",
+            "• *\"Show high risk detections\"*",
+            "• *\"Generate a report\"*",
+            "• *\"Plan a repair route for 10 potholes\"*",
+            "• *\"I want to fix something\"*"
+        )
     
     # How are you patterns
-    elif re.search(r'(how are you|how\'s it going|what\'s up)', message_lower):
-        fallback = f"I'm doing great, thanks for asking! 😊\n\n"
-        fallback += f"I'm currently monitoring **{stats['total_detections']}** road defects.\n"
-        fallback += f"There are **{stats['high_severity']}** high-priority issues that need attention!\n\n"
-        fallback += "How can I help you today?"
+    elif HOW_ARE_YOU_RE.search(message_lower):
+        lines = (
+            "I'm doing great, thanks for asking! 😊",
+            "",
+            f"I'm currently monitoring **{stats['total_detections']}** road defects.",
+            f"There are **{stats['high_severity']}** high-priority issues that need attention!",
+            "",
+            "How can I help you today?"
+        )
     
     # Help patterns
-    elif re.search(r'(help|what can you do|capabilities|features)', message_lower):
-        fallback = "🤖 **I can help you with:**\n\n"
-        fallback += "📊 **Reports** - Get statistics and summaries\n"
-        fallback += "🗺️ **Route Planning** - Find shortest repair paths\n"
-        fallback += "⚠️ **Risk Filtering** - View high/medium/low risk detections\n"
-        fallback += "🔍 **Search** - Find specific potholes or cracks\n"
-        fallback += "🔧 **Track Repairs** - Mark issues as fixed\n\n"
-        fallback += "Just ask naturally, like:\n"
-        fallback += "• *\"What's the current status?\"*\n"
-        fallback += "• *\"Show me critical issues\"*\n"
-        fallback += "• *\"Plan a route to fix 5 potholes\"*"
+    elif HELP_RE.search(message_lower):
+        lines = (
+            "🤖 **I can help you with:**",
+            "",
+            "📊 **Reports** - Get statistics and summaries",
+            "🗺️ **Route Planning** - Find shortest repair paths",
+            "⚠️ **Risk Filtering** - View high/medium/low risk detections",
+            "🔍 **Search** - Find specific potholes or cracks",
+            "🔧 **Track Repairs** - Mark issues as fixed",
+            "",
+            "Just ask naturally, like:",
+            "• *\"What's the current status?\"*",
+            "• *\"Show me critical issues\"*",
+            "• *\"Plan a route to fix 5 potholes\"*"
+        )
     
     # Thanks patterns
-    elif re.search(r'(thank|thanks|appreciate)', message_lower):
-        fallback = "You're welcome! 😊\n\nIs there anything else I can help you with?"
+    elif THANKS_RE.search(message_lower):
+        lines = ("You're welcome! 😊", "", "Is there anything else I can help you with?")
     
     # Default fallback
     else:
-        fallback = f"I understand you're asking: *\"{user_message}\"*\n\n"
-        fallback += f"📊 **Here's the current status:**\n"
-        fallback += f"- Total active defects: **{stats['total_detections']}**\n"
-        fallback += f"- Potholes: {stats['total_potholes']} | Cracks: {stats['total_cracks']}\n"
-        fallback += f"- High risk: 🔴 {stats['high_severity']} | Medium: 🟡 {stats['medium_severity']} | Low: 🟢 {stats['low_severity']}\n"
-        fallback += f"- Fixed: ✅ {stats['fixed_count']}\n\n"
-        fallback += "**Quick actions you can try:**\n"
-        fallback += "• Use the buttons above for common tasks\n"
-        fallback += "• Ask *\"show high risk\"* to filter by severity\n"
-        fallback += "• Ask *\"fix\"* to update repair status\n\n"
-        fallback += "⚠️ *Note: LLM service is currently unavailable. Basic responses only.*"
-    
-    return fallback
+        lines = (
+            f"I understand you're asking: *\"{user_message}\"*",
+            "",
+            "📊 **Here's the current status:**",
+            f"- Total active defects: **{stats['total_detections']}**",
+            f"- Potholes: {stats['total_potholes']} | Cracks: {stats['total_cracks']}",
+            f"- High risk: 🔴 {stats['high_severity']} | Medium: 🟡 {stats['medium_severity']} | Low: 🟢 {stats['low_severity']}",
+            f"- Fixed: ✅ {stats['fixed_count']}",
+            "",
+            "**Quick actions you can try:**",
+            "• Use the buttons above for common tasks",
+            "• Ask *\"show high risk\"* to filter by severity",
+            "• Ask *\"fix\"* to update repair status",
+            "",
+            "⚠️ *Note: LLM service is currently unavailable. Basic responses only.*"
+        )
+    
+    return "\n".join(lines)
+
+# Keywords that indicate on-topic questions (substring matches, so 'hi' also matches 'this')
+ON_TOPIC_KEYWORDS = (
+    'pothole', 'crack', 'road', 'damage', 'detection', 'detect', 'repair', 
+    'fix', 'fixed', 'report', 'path', 'route', 'risk', 'high', 'medium', 'low',
+    'dashboard', 'map', 'location', 'gps', 'camera', 'dashcam', 'capture',
+    'statistic', 'stats', 'count', 'total', 'how many', 'show', 'list', 'view',
+    'defect', 'issue', 'problem', 'severity', 'confidence', 'priority',
+    'technician', 'update', 'status', 'help', 'hello', 'hi', 'hey', 'thank',
+    'what can you', 'how are you', 'system', 'assistant', 'feature'
+)
+ON_TOPIC_WORDS = frozenset(k for k in ON_TOPIC_KEYWORDS if ' ' not in k)
+ON_TOPIC_RE = re.compile('|'.join(map(re.escape, ON_TOPIC_KEYWORDS)))
+
+# Off-topic patterns (celebrities, general knowledge, etc.)
+OFF_TOPIC_PATTERNS = (
+    r'\bwho is\b', r'\bwho was\b', r'\bwho are\b',
+    r'\bwhat is\b(?!.*(?:pothole|crack|road|damage|detection|repair|risk|system))',
+    r'\btell me about\b(?!.*(?:pothole|crack|road|damage|detection|repair))',
+    r'\bexplain\b(?!.*(?:pothole|crack|road|damage|detection|repair|system))',
+    r'\bwrite\b(?!.*(?:report|summary))', r'\bcode\b', r'\bprogram\b',
+    r'\bcelebrit', r'\bfootball\b', r'\bsoccer\b', r'\bcricket\b', r'\bsport\b',
+    r'\bmovie\b', r'\bfilm\b', r'\bsong\b', r'\bmusic\b', r'\bactor\b', r'\bsinger\b',
+    r'\bpresident\b', r'\bminister\b', r'\bpolitician\b', r'\bking\b', r'\bqueen\b',
+    r'\bcountry\b(?!.*road)', r'\bcapital\b', r'\bpopulation\b',
+    r'\brecipe\b', r'\bcook\b', r'\bfood\b', r'\brestaurant\b',
+    r'\bgame\b', r'\bplay\b(?!.*video)', r'\bscore\b',
+    r'\bweather\b', r'\btemperature\b', r'\bclimate\b',
+    r'\bmath\b', r'\bcalculate\b(?!.*distance|path)', r'\bequation\b',
+    r'\bhistory\b(?!.*detection)', r'\bwar\b', r'\bbattle\b',
+    r'\bscience\b', r'\bphysics\b', r'\bchemistry\b', r'\bbiology\b',
+    r'\bstory\b', r'\bpoem\b', r'\bjoke\b', r'\bfunny\b',
+    r'\bmessi\b', r'\bronaldo\b', r'\bneymar\b', r'\btrump\b', r'\bobama\b', r'\bbiden\b'
+)
+# One alternation scans the message once instead of once per pattern
+OFF_TOPIC_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in OFF_TOPIC_PATTERNS))
 
 def is_off_topic(message):
     """Check if message is off-topic (not related to road damage/potholes)"""
     message_lower = message.lower()
     
-    # Keywords that indicate on-topic questions
-    on_topic_keywords = [
-        'pothole', 'crack', 'road', 'damage', 'detection', 'detect', 'repair', 
-        'fix', 'fixed', 'report', 'path', 'route', 'risk', 'high', 'medium', 'low',
-        'dashboard', 'map', 'location', 'gps', 'camera', 'dashcam', 'capture',
-        'statistic', 'stats', 'count', 'total', 'how many', 'show', 'list', 'view',
-        'defect', 'issue', 'problem', 'severity', 'confidence', 'priority',
-        'technician', 'update', 'status', 'help', 'hello', 'hi', 'hey', 'thank',
-        'what can you', 'how are you', 'system', 'assistant', 'feature'
-    ]
-    
-    # Check if message contains on-topic keywords
-    for keyword in on_topic_keywords:
-        if keyword in message_lower:
-            return False
-    
-    # Off-topic patterns (celebrities, general knowledge, etc.)
-    off_topic_patterns = [
-        r'\bwho is\b', r'\bwho was\b', r'\bwho are\b',
-        r'\bwhat is\b(?!.*(?:pothole|crack|road|damage|detection|repair|risk|system))',
-        r'\btell me about\b(?!.*(?:pothole|crack|road|damage|detection|repair))',
-        r'\bexplain\b(?!.*(?:pothole|crack|road|damage|detection|repair|system))',
-        r'\bwrite\b(?!.*(?:report|summary))', r'\bcode\b', r'\bprogram\b',
-        r'\bcelebrit', r'\bfootball\b', r'\bsoccer\b', r'\bcricket\b', r'\bsport\b',
-        r'\bmovie\b', r'\bfilm\b', r'\bsong\b', r'\bmusic\b', r'\bactor\b', r'\bsinger\b',
-        r'\bpresident\b', r'\bminister\b', r'\bpolitician\b', r'\bking\b', r'\bqueen\b',
-        r'\bcountry\b(?!.*road)', r'\bcapital\b', r'\bpopulation\b',
-        r'\brecipe\b', r'\bcook\b', r'\bfood\b', r'\brestaurant\b',
-        r'\bgame\b', r'\bplay\b(?!.*video)', r'\bscore\b',
-        r'\bweather\b', r'\btemperature\b', r'\bclimate\b',
-        r'\bmath\b', r'\bcalculate\b(?!.*distance|path)', r'\bequation\b',
-        r'\bhistory\b(?!.*detection)', r'\bwar\b', r'\bbattle\b',
-        r'\bscience\b', r'\bphysics\b', r'\bchemistry\b', r'\bbiology\b',
-        r'\bstory\b', r'\bpoem\b', r'\bjoke\b', r'\bfunny\b',
-        r'\bmessi\b', r'\bronaldo\b', r'\bneymar\b', r'\btrump\b', r'\bobama\b', r'\bbiden\b'
-    ]
-    
-    for pattern in off_topic_patterns:
-        if re.search(pattern, message_lower):
-            return True
-    
-    return False
+    # Whole-word hits are the common case; the regex also catches keywords inside other words
+    if not ON_TOPIC_WORDS.isdisjoint(message_lower.split()) or ON_TOPIC_RE.search(message_lower):
+        return False
+    
+    return OFF_TOPIC_RE.search(message_lower) is not None
 
 def get_off_topic_response():
     """Return a polite response for off-topic questions"""
@@ -336,34 +529,93 @@ def get_off_topic_response():
 
 How can I help you with road damage detection today?"""
 
-def process_chat_message(user_message, history):
-    """Main function to process chat messages"""
-    stats = get_detection_stats()
-    detections = get_all_detections()
-    repairs = get_all_repairs()
+async def fetch_chat_snapshot():
+    """Stats, five high-risk samples, the last ten repairs and the data version, read in parallel"""
+    return await asyncio.gather(
+        asyncio.to_thread(get_detection_stats),
+        asyncio.to_thread(get_detections_by_risk, 'high', 5),
+        asyncio.to_thread(get_recent_repairs, 10),
+        asyncio.to_thread(get_data_version)
+    )
+
+async def get_chat_snapshot():
+    """Chats arriving within CHAT_SNAPSHOT_WINDOW of each other share one database read"""
+    global _snapshot
+    now = get_event_loop().time()
+    if _snapshot is None or now - _snapshot[0] > CHAT_SNAPSHOT_WINDOW:
+        _snapshot = (now, asyncio.ensure_future(fetch_chat_snapshot()))
+    # shield: one cancelled chat must not cancel the read the others are waiting on
+    return await asyncio.shield(_snapshot[1])
+
+async def get_intent_content(user_message, repairs, stats, data_version):
+    """detect_intent_and_content, reused for a repeated message until the data changes"""
+    key = (user_message.lower(), data_version, tuple(stats.values()))
+    if key in _content_cache:
+        _content_cache.move_to_end(key)
+        return _content_cache[key]
     
-    # Check for off-topic questions first
+    content = await asyncio.to_thread(detect_intent_and_content, user_message, repairs, stats)
+    _content_cache[key] = content
+    if len(_content_cache) > CONTENT_CACHE_SIZE:
+        _content_cache.popitem(last=False)
+    return content
+
+async def prepare_chat(user_message, history):
+    """Gather everything a chat turn needs before the LLM call.
+
+    Returns (response, content_task, stats, context_key, messages, system_prompt). `response`
+    is already set for off-topic and cached questions, which need no LLM call; `content_task`
+    resolves to the UI content, prepared in the background while the LLM call is in flight
+    (None for off-topic questions).
+    """
+    # Check for off-topic questions first, before touching the database
     if is_off_topic(user_message):
-        return {
-            'success': True,
-            'response': get_off_topic_response(),
-            'content': None
-        }
+        return get_off_topic_response(), None, None, None, None, None
+    
+    stats, high_risk_samples, repairs, data_version = await get_chat_snapshot()
+    
+    # Detect intent and prepare UI content without holding up the LLM request
+    content_task = asyncio.ensure_future(get_intent_content(user_message, repairs, stats, data_version))
     
-    # Detect intent and prepare UI content
-    content = detect_intent_and_content(user_message, detections, repairs, stats)
+    # History from the UI is normally already {role, content}; only reshape entries that aren't
+    recent = history[-10:]
+    if not all(m.keys() == MESSAGE_KEYS for m in recent):
+        recent = [{"role": m['role'], "content": m['content']} for m in recent]
+    
+    # Repeated questions about unchanged data reuse the earlier answer; the conversation is part
+    # of the key, so follow-ups like "tell me more" only match the same preceding turns
+    context_key = (
+        classify_intent(user_message.lower())[0],
+        prompt_cache_key(stats, high_risk_samples, repairs),
+        tuple((m['role'], m['content']) for m in recent)
+    )
+    cached = get_cached_response(context_key, user_message)
+    if cached:
+        return cached, content_task, stats, context_key, None, None
     
     # Build system prompt with current data
-    system_prompt = build_system_prompt(stats, detections, repairs)
+    system_prompt = build_system_prompt(stats, high_risk_samples, repairs)
     
     # Prepare messages for LLM
-    messages = [{"role": m['role'], "content": m['content']} for m in history[-10:]]
-    messages.append({"role": "user", "content": user_message})
+    messages = recent + [{"role": "user", "content": user_message}]
     
-    # Call LLM
-    llm_response = call_groq_llm(messages, system_prompt)
+    return None, content_task, stats, context_key, messages, system_prompt
+
+async def aprocess_chat_message(user_message, history):
+    """Main function to process chat messages"""
+    response, content_task, stats, context_key, messages, system_prompt = await prepare_chat(user_message, history)
+    if response:
+        return {
+            'success': True,
+            'response': response,
+            'content': await content_task if content_task else None
+        }
+    
+    # Call LLM while the UI content is being prepared
+    llm_response, content = await asyncio.gather(acall_groq_llm(messages, system_prompt), content_task)
     
     if llm_response:
+        cache_response(context_key, user_message, llm_response)
         return {
             'success': True,
             'response': llm_response,
@@ -377,3 +629,61 @@ def process_chat_message(user_message, history):
             'response': fallback,
             'content': content
         }
+
+def process_chat_message(user_message, history):
+    """Blocking wrapper around aprocess_chat_message for the Flask routes"""
+    return run_async(aprocess_chat_message(user_message, history))
+
+async def astream_chat_message(user_message, history):
+    """Like aprocess_chat_message, but yields events as the answer is generated.
+
+    Yields {'content': ...} first, then {'delta': text} chunks, then {'done': True, 'response': full_text}.
+    If the LLM stream breaks after some text was sent, the last event is
+    {'success': False, 'error': ..., 'response': partial_text} instead, and nothing is cached.
+    """
+    response, content_task, stats, context_key, messages, system_prompt = await prepare_chat(user_message, history)
+    
+    if not response:
+        chunks = []
+        deltas = astream_groq_llm(messages, system_prompt)
+        try:
+            async for delta in deltas:
+                if not chunks:
+                    # The UI content was prepared while waiting for the first token
+                    yield {'content': await content_task}
+                chunks.append(delta)
+                yield {'delta': delta}
+        except Exception:
+            if chunks:
+                yield {'success': False, 'error': 'The answer was interrupted, please try again', 'response': ''.join(chunks)}
+                return
+            # Nothing was sent yet: answer with the fallback below
+        else:
+            if chunks:
+                response = ''.join(chunks)
+                cache_response(context_key, user_message, response)
+                yield {'done': True, 'response': response}
+                return
+        finally:
+            # Also runs when our consumer goes away mid-answer: async for doesn't close the stream itself
+            await deltas.aclose()
+        
+        # Generate fallback response
+        response = generate_fallback_response(user_message, stats)
+    
+    yield {'content': await content_task if content_task else None}
+    yield {'delta': response}
+    yield {'done': True, 'response': response}
+
+def stream_chat_message(user_message, history):
+    """Blocking generator over astream_chat_message's events for the Flask routes"""
+    events = astream_chat_message(user_message, history)
+    try:
+        while True:
+            try:
+                yield run_async(events.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        # Client went away (Flask closed us) or we finished: close the Groq stream and its connection now
+        run_async(events.aclose())
@@ -0,0 +1,35 @@
+# Tests for the chat answer cache in llm_assistant
+
+import pytest
+
+import llm_assistant
+
+CONTEXT = ('high', ('stats',), ())
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    llm_assistant._response_cache.clear()
+    yield
+    llm_assistant._response_cache.clear()
+
+def test_same_question_hits_cache():
+    llm_assistant.cache_response(CONTEXT, 'Which potholes are high risk?', 'answer')
+    assert llm_assistant.get_cached_response(CONTEXT, 'which potholes are HIGH risk') == 'answer'
+
+@pytest.mark.parametrize('question', [
+    'which potholes are not high risk',    # negation
+    'which cracks are high risk',          # swapped operand
+    'which potholes are high risk today',  # near duplicate
+])
+def test_different_question_misses_cache(question):
+    llm_assistant.cache_response(CONTEXT, 'which potholes are high risk', 'answer')
+    assert llm_assistant.get_cached_response(CONTEXT, question) is None
+
+def test_changed_number_misses_cache():
+    llm_assistant.cache_response(CONTEXT, 'plan a route for 5 potholes', 'answer')
+    assert llm_assistant.get_cached_response(CONTEXT, 'plan a route for 10 potholes') is None
+
+def test_other_context_misses_cache():
+    llm_assistant.cache_response(CONTEXT, 'tell me more about it', 'answer')
+    other = (CONTEXT[0], CONTEXT[1], (('user', 'show pothole #7'),))
+    assert llm_assistant.get_cached_response(other, 'tell me more about it') is None
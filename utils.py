@@ -1,83 +1,556 @@
 # Utility functions for the Pothole Detection System
-# Includes distance calculation, path finding, and geolocation
+# Includes distance calculation, path finding, geolocation and video capture/encoding
 # Author: Hasan Nayon
 
+import asyncio
 import math
-import requests
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+import cv2
+import httpx
+import numpy as np
 from datetime import datetime
+from config import GEOLOCATION_CACHE_TTL, ROUTE_STARTS, ROUTE_CACHE_SIZE
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points using Haversine formula"""
-    R = 6371  # Earth's radius in km
-    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
-    return R * c
+try:
+    from numba import njit, prange
+    NUMBA = True
+except ImportError:  # route planning falls back to the vectorized NumPy kernel below
+    NUMBA = False
+    prange = range
+    def njit(*args, **kwargs):
+        return lambda func: func
 
-def nearest_neighbor_path(points, start_idx=0):
-    """Find shortest path using nearest neighbor algorithm"""
-    if not points:
-        return [], 0
+try:
+    from orjson import loads as json_loads
+except ImportError:  # stdlib json parses the same responses, just slower
+    from json import loads as json_loads
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # very large routes then use the O(n^2) kernels
+    cKDTree = None
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    turbo_jpeg = TurboJPEG()
+except Exception:  # PyTurboJPEG or the libturbojpeg shared library is missing
+    turbo_jpeg = None
+
+# BGR colors for the detection overlay
+BOX_COLOR = (255, 0, 255)
+TEXT_COLOR = (255, 255, 255)
+
+# (url, latitude key, longitude key, city key, country key) for each service's response
+GEOLOCATION_SERVICES = [
+    ('https://ipapi.co/json/', 'latitude', 'longitude', 'city', 'country_name'),
+    ('http://ip-api.com/json/', 'lat', 'lon', 'city', 'country'),
+    ('https://geolocation-db.com/json/', 'latitude', 'longitude', 'city', 'country_name')
+]
+
+# One background asyncio loop serves the Groq client and the geolocation probes;
+# its keep-alive AsyncClients are only touched from that loop
+_loop = None
+_loop_lock = threading.Lock()
+_geolocation_client = None
+
+# Largest route for which the full distance matrix is built (2000 points = 32 MB of float64)
+MATRIX_MAX_POINTS = 2000
+# Multistart tours run on Numba's thread pool from this many points (below it, dispatch costs more than it saves)
+PARALLEL_MIN_POINTS = 200
+
+# Multistart routes up to this long are refined with 2-opt (quadratic per pass)
+TWO_OPT_MAX_POINTS = 1000 if NUMBA else 100
+
+# Nearest points remembered per point for multistart tours (full scan once they are all visited)
+NEIGHBOR_LIST_SIZE = 16
+
+# Routes at least this long use the KD-tree search (where it overtakes the O(n^2) kernels)
+KDTREE_MIN_POINTS = 10000 if NUMBA else 2000
+
+_location_cache = {'time': None, 'value': None}
+_location_lock = threading.Lock()
+_location_inflight = None  # Future of the lookup in progress, shared by concurrent callers
+
+def haversine_a_matrix(lat, lng):
+    """Symmetric N x N matrix of the haversine 'a' term (radians in; 8*N^2 bytes).
+
+    a orders pairs exactly like their distance, so ranking needs no arcsin/sqrt;
+    _a_to_km converts the entries actually used.
+    """
+    cos_lat = np.cos(lat)
+    a = (np.sin(np.subtract.outer(lat, lat) * 0.5) ** 2
+         + np.multiply.outer(cos_lat, cos_lat) * np.sin(np.subtract.outer(lng, lng) * 0.5) ** 2)
+    return np.minimum(a, 1.0, out=a)
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _haversine_a(lat1, lon1, lat2, lon2):
+    """Haversine 'a' term for coordinates already in radians (monotonic in distance)"""
+    return math.sin((lat2 - lat1) * 0.5) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) * 0.5) ** 2
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _a_to_km(a):
+    """Great-circle distance in km for a haversine 'a' term"""
+    return 2 * 6371 * math.asin(math.sqrt(min(a, 1.0)))
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _haversine_rad(lat1, lon1, lat2, lon2):
+    """Haversine distance in km for coordinates already in radians"""
+    return _a_to_km(_haversine_a(lat1, lon1, lat2, lon2))
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _unit_sphere(lat, lng):
+    """Unit-sphere x, y, z for radian lat/lng arrays.
+
+    Chord length orders neighbours exactly like great-circle distance (also
+    across the antimeridian and near the poles) with no trig inside a scan.
+    """
+    cos_lat = np.cos(lat)
+    return cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _neighbor_lists(lat, lng, k):
+    """The k nearest other points of every point, closest first (ties keep index order)"""
+    n = lat.shape[0]
+    x, y, z = _unit_sphere(lat, lng)
+    neighbors = np.empty((n, k), np.int64)
+    best = np.empty(k)
+    for i in range(n):
+        count = 0
+        for j in range(n):
+            if j == i:
+                continue
+            dx = x[j] - x[i]
+            dy = y[j] - y[i]
+            dz = z[j] - z[i]
+            dist = dx * dx + dy * dy + dz * dz
+            if count == k and dist >= best[k - 1]:
+                continue
+            # Insertion into the short sorted list, dropping its farthest entry once full
+            pos = count if count < k else k - 1
+            while pos > 0 and best[pos - 1] > dist:
+                best[pos] = best[pos - 1]
+                neighbors[i, pos] = neighbors[i, pos - 1]
+                pos -= 1
+            best[pos] = dist
+            neighbors[i, pos] = j
+            if count < k:
+                count += 1
+    return neighbors
+
+@njit(cache=True, nogil=True)
+def _nn_path_kernel(lat, lng, start_idx):
+    """Greedy nearest-neighbor tour over radian lat/lng arrays"""
+    return _nn_tour(lat, lng, start_idx, np.empty((lat.shape[0], 0), np.int64))
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _nn_tour(lat, lng, start_idx, neighbors):
+    """Greedy nearest-neighbor tour, trying each point's sorted candidate list before a full scan.
+
+    The first unvisited entry of neighbors[current] is the nearest unvisited
+    point; only when the whole list has been visited are all n points scanned.
+    """
+    n = lat.shape[0]
+    k = neighbors.shape[1]
+    x, y, z = _unit_sphere(lat, lng)
+    visited = np.zeros(n, np.bool_)
+    path = np.empty(n, np.int64)
+    path[0] = start_idx
+    visited[start_idx] = True
+    total_distance = 0.0
     
-    n = len(points)
-    visited = [False] * n
-    path = [start_idx]
+    current = start_idx
+    for step in range(1, n):
+        nearest = -1
+        for c in range(k):
+            if not visited[neighbors[current, c]]:
+                nearest = neighbors[current, c]
+                break
+        
+        if nearest < 0:
+            min_dist = np.inf
+            for j in range(n):
+                if not visited[j]:
+                    dx = x[j] - x[current]
+                    dy = y[j] - y[current]
+                    dz = z[j] - z[current]
+                    dist = dx * dx + dy * dy + dz * dz
+                    if dist < min_dist:
+                        min_dist = dist
+                        nearest = j
+        
+        visited[nearest] = True
+        path[step] = nearest
+        total_distance += _haversine_rad(lat[current], lng[current], lat[nearest], lng[nearest])
+        current = nearest
+    
+    return path, total_distance
+
+def _nn_path_numpy(lat, lng, start_idx, matrix=None, neighbors=None):
+    """Greedy nearest-neighbor tour without Numba: one vectorized distance sweep per step.
+
+    Multistart callers pass the shared haversine_a_matrix and its sorted
+    candidate lists (see _matrix_neighbor_lists) so most steps skip the sweep.
+    """
+    n = lat.shape[0]
+    # Small tours compute every pairwise haversine 'a' once and then only index rows;
+    # larger ones rank by squared chord length on the unit sphere (no trig per step).
+    # Either way only the chosen edge is converted to km
+    if matrix is None and n <= MATRIX_MAX_POINTS:
+        matrix = haversine_a_matrix(lat, lng)
+    if matrix is None:
+        cos_lat = np.cos(lat)
+        xyz = np.column_stack((cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)))
+        diff = np.empty_like(xyz)
+    visited = np.zeros(n, dtype=bool)
     visited[start_idx] = True
-    total_distance = 0
+    seen = visited.tolist()  # plain-list twin of visited for the candidate walk
+    dist = np.empty(n)  # scratch row, reused every step
+    path = np.empty(n, np.int64)
+    path[0] = start_idx
+    total_distance = 0.0
     
     current = start_idx
-    for _ in range(n - 1):
-        nearest = None
-        min_dist = float('inf')
+    for step in range(1, n):
+        nearest = -1
+        if neighbors is not None:
+            for candidate in neighbors[current]:
+                if not seen[candidate]:
+                    nearest = candidate
+                    break
         
-        for j in range(n):
-            if not visited[j]:
-                dist = calculate_distance(
-                    points[current]['lat'], points[current]['lng'],
-                    points[j]['lat'], points[j]['lng']
-                )
-                if dist < min_dist:
-                    min_dist = dist
+        if nearest < 0:
+            if matrix is not None:
+                np.copyto(dist, matrix[current])
+            else:
+                np.subtract(xyz, xyz[current], out=diff)
+                np.einsum('ij,ij->i', diff, diff, out=dist)
+            # Masked copy instead of fancy indexing: no temporary arrays, no per-element branches
+            np.copyto(dist, np.inf, where=visited)
+            nearest = int(dist.argmin())
+        
+        visited[nearest] = True
+        seen[nearest] = True
+        path[step] = nearest
+        if matrix is not None:
+            total_distance += _a_to_km(matrix[current, nearest])
+        else:
+            total_distance += _haversine_rad(lat[current], lng[current], lat[nearest], lng[nearest])
+        current = nearest
+    
+    return path, total_distance
+
+def _matrix_neighbor_lists(matrix, k):
+    """The k + 1 nearest points of every row (itself included), closest first, as Python lists"""
+    nearest = np.argpartition(matrix, k, axis=1)[:, :k + 1]
+    order = np.argsort(np.take_along_axis(matrix, nearest, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(nearest, order, axis=1).tolist()
+
+def _nn_path_kdtree(lat, lng, start_idx):
+    """Greedy nearest-neighbor tour in O(n log n) using a KD-tree over unit-sphere points.
+
+    Chord length is monotonic in great-circle distance, so the Euclidean nearest
+    neighbour is the haversine nearest neighbour. The tree is rebuilt over the
+    unvisited points once half of its points have been visited.
+    """
+    n = lat.shape[0]
+    cos_lat = np.cos(lat)
+    xyz = np.column_stack((cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)))
+    unvisited = np.ones(n, dtype=bool)
+    unvisited[start_idx] = False
+    path = np.empty(n, np.int64)
+    path[0] = start_idx
+    total_distance = 0.0
+    
+    remaining = np.flatnonzero(unvisited)
+    tree = cKDTree(xyz[remaining])
+    visited_in_tree = 0
+    
+    current = start_idx
+    for step in range(1, n):
+        nearest = -1
+        k = 8
+        while nearest < 0:
+            _, idx = tree.query(xyz[current], k=min(k, len(remaining)))
+            for j in remaining[np.atleast_1d(idx)]:
+                if unvisited[j]:
                     nearest = j
+                    break
+            k *= 4
         
-        if nearest is not None:
-            visited[nearest] = True
-            path.append(nearest)
-            total_distance += min_dist
-            current = nearest
+        unvisited[nearest] = False
+        path[step] = nearest
+        total_distance += _haversine_rad(lat[current], lng[current], lat[nearest], lng[nearest])
+        current = nearest
+        
+        visited_in_tree += 1
+        if visited_in_tree * 2 > len(remaining) and step < n - 1:
+            remaining = np.flatnonzero(unvisited)
+            tree = cKDTree(xyz[remaining])
+            visited_in_tree = 0
     
     return path, total_distance
 
-def get_automatic_location():
-    """Get location from IP geolocation services"""
+@njit(cache=True, fastmath=True, nogil=True)
+def _reverse(path, i, j):
+    """Reverse path[i..j] in place"""
+    while i < j:
+        path[i], path[j] = path[j], path[i]
+        i += 1
+        j -= 1
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _two_opt_kernel(lat, lng, path):
+    """2-opt an open tour in place: reverse segments while that shortens it (first stop stays first)"""
+    n = path.shape[0]
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            a = path[i - 1]
+            for j in range(i + 1, n):
+                b = path[i]
+                c = path[j]
+                # Replace edges a-b and c-d with a-c and b-d (no c-d edge when c is the last stop)
+                delta = _haversine_rad(lat[a], lng[a], lat[c], lng[c]) - _haversine_rad(lat[a], lng[a], lat[b], lng[b])
+                if j < n - 1:
+                    d = path[j + 1]
+                    delta += _haversine_rad(lat[b], lng[b], lat[d], lng[d]) - _haversine_rad(lat[c], lng[c], lat[d], lng[d])
+                if delta < -1e-9:
+                    _reverse(path, i, j)
+                    improved = True
+    
+    total_distance = 0.0
+    for k in range(1, n):
+        total_distance += _haversine_rad(lat[path[k - 1]], lng[path[k - 1]], lat[path[k]], lng[path[k]])
+    return path, total_distance
+
+def _nn_multistart(lat, lng, starts):
+    """Nearest-neighbor tours from several starts; returns each path and length"""
+    # One O(n^2) pass builds the candidate lists every tour then mostly walks instead of scanning
+    neighbors = _neighbor_lists(lat, lng, min(NEIGHBOR_LIST_SIZE, lat.shape[0] - 1))
+    paths = np.empty((starts.shape[0], lat.shape[0]), np.int64)
+    lengths = np.empty(starts.shape[0])
+    for i in prange(starts.shape[0]):
+        paths[i], lengths[i] = _nn_tour(lat, lng, starts[i], neighbors)
+    return paths, lengths
+
+# Threads only pay off once each tour has real work; small routes run the starts serially
+_nn_multistart_kernel = njit(cache=True, parallel=True, nogil=True)(_nn_multistart)
+_nn_multistart_serial = njit(cache=True, nogil=True)(_nn_multistart)
+
+def warmup_route_kernels():
+    """Compile (or load from Numba's on-disk cache) every route kernel so no request pays the JIT cost"""
+    if not NUMBA:
+        return
+    
+    from numba import types
+    coords = types.float64[::1]
     try:
-        services = [
-            'https://ipapi.co/json/',
-            'http://ip-api.com/json/',
-            'https://geolocation-db.com/json/'
-        ]
+        _nn_path_kernel.compile((coords, coords, types.int64))
+        _two_opt_kernel.compile((coords, coords, types.int64[::1]))
+        for kernel in (_nn_multistart_serial, _nn_multistart_kernel):
+            kernel.compile((coords, coords, types.int64[::1]))
+        print("Route kernels compiled")
+    except Exception as e:
+        print(f"Route kernel warm-up failed: {e}")
+
+def coords_array(points):
+    """(K, 2) float64 array of [lat, lng] rows from detection dicts"""
+    n = len(points)
+    return np.fromiter(
+        (v for p in points for v in (p['lat'], p['lng'])), dtype=np.float64, count=2 * n
+    ).reshape(n, 2)
+
+def _nn_path_function(n):
+    """Fastest available single-tour kernel for an n-point route"""
+    if cKDTree is not None and n >= KDTREE_MIN_POINTS:
+        return _nn_path_kdtree
+    return _nn_path_kernel if NUMBA else _nn_path_numpy
+
+def nearest_neighbor_path(points, start_idx=0):
+    """Find shortest path using nearest neighbor algorithm over a (K, 2) lat/lng array (or a list of detection dicts)"""
+    if len(points) == 0:
+        return [], 0
+    
+    coords = np.radians(points if isinstance(points, np.ndarray) else coords_array(points))
+    lat = np.ascontiguousarray(coords[:, 0])
+    lng = np.ascontiguousarray(coords[:, 1])
+    
+    path, total_distance = _nn_path_function(len(lat))(lat, lng, start_idx)
+    return path.tolist(), float(total_distance)
+
+def nearest_neighbor_path_multistart(points, starts=ROUTE_STARTS):
+    """Shortest of the nearest-neighbor tours from `starts` evenly spread start points (index 0 included)"""
+    if len(points) <= 2:
+        # Nothing to choose: visit the points in order
+        return nearest_neighbor_path(points)
+    
+    # The dashboard and the assistant keep asking for the route over the same detections,
+    # so whole routes are memoized on the exact coordinates (a hit skips every tour and 2-opt)
+    coords = np.ascontiguousarray(points if isinstance(points, np.ndarray) else coords_array(points), dtype=np.float64)
+    path, total_distance = _multistart_route(coords.tobytes(), starts)
+    return list(path), total_distance
+
+@lru_cache(maxsize=ROUTE_CACHE_SIZE)
+def _multistart_route(coords_bytes, starts):
+    """nearest_neighbor_path_multistart for a (K, 2) degree array serialized to bytes; returns (path tuple, km)"""
+    coords = np.radians(np.frombuffer(coords_bytes).reshape(-1, 2))
+    lat = np.ascontiguousarray(coords[:, 0])
+    lng = np.ascontiguousarray(coords[:, 1])
+    count = min(starts, len(lat))
+    start_idx = np.arange(count, dtype=np.int64) * (len(lat) - 1) // max(count - 1, 1)  # distinct since count <= n
+    
+    if cKDTree is not None and len(lat) >= KDTREE_MIN_POINTS:
+        # Huge routes: one O(n log n) tour beats several O(n^2) ones
+        path, total_distance = _nn_path_kdtree(lat, lng, 0)
+        return tuple(path.tolist()), float(total_distance)
+    elif NUMBA:
+        kernel = _nn_multistart_kernel if len(lat) >= PARALLEL_MIN_POINTS else _nn_multistart_serial
+        paths, lengths = kernel(lat, lng, start_idx)
+    else:
+        matrix = neighbors = None
+        if len(lat) <= MATRIX_MAX_POINTS:
+            # Every start shares one distance matrix and its candidate lists
+            matrix = haversine_a_matrix(lat, lng)
+            neighbors = _matrix_neighbor_lists(matrix, min(NEIGHBOR_LIST_SIZE, len(lat) - 1))
+        tours = [_nn_path_numpy(lat, lng, start, matrix, neighbors) for start in start_idx]
+        paths, lengths = [path for path, _ in tours], np.array([length for _, length in tours])
+    
+    best = int(np.argmin(lengths))
+    path, total_distance = paths[best], lengths[best]
+    if len(lat) <= TWO_OPT_MAX_POINTS:
+        path, total_distance = _two_opt_kernel(lat, lng, np.array(path, np.int64))
+    return tuple(path.tolist()), float(total_distance)
+
+def get_event_loop():
+    """Background asyncio loop for network requests, started on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, daemon=True).start()
+    return _loop
+
+def run_async(coro):
+    """Run a coroutine on the background loop and wait for its result (for sync callers)"""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+def get_geolocation_client():
+    """Shared AsyncClient for the geolocation services; only touched from the background loop"""
+    global _geolocation_client
+    if _geolocation_client is None:
+        _geolocation_client = httpx.AsyncClient(
+            timeout=3,
+            limits=httpx.Limits(max_keepalive_connections=len(GEOLOCATION_SERVICES))
+        )
+    return _geolocation_client
+
+async def fetch_location(service):
+    """Query one IP geolocation service, returning None if it has no coordinates"""
+    url, lat_key, lon_key, city_key, country_key = service
+    data = json_loads((await get_geolocation_client().get(url)).content)
+    
+    lat = data.get(lat_key)
+    lon = data.get(lon_key)
+    
+    if lat and lon:
+        return {
+            'latitude': lat,
+            'longitude': lon,
+            'city': data.get(city_key, 'Unknown'),
+            'country': data.get(country_key) or 'Unknown'
+        }
+    return None
+
+def get_automatic_location():
+    """Get location from IP geolocation services (first answer wins, cached for GEOLOCATION_CACHE_TTL)"""
+    global _location_inflight
+    with _location_lock:
+        if _location_cache['value'] is not None and time.monotonic() - _location_cache['time'] < GEOLOCATION_CACHE_TTL:
+            return _location_cache['value']
         
-        for service in services:
-            try:
-                response = requests.get(service, timeout=3)
-                data = response.json()
-                
-                lat = data.get('latitude') or data.get('lat')
-                lon = data.get('longitude') or data.get('lon')
+        # Concurrent cache misses wait for one lookup instead of each probing every service
+        inflight = _location_inflight
+        if inflight is None:
+            inflight = _location_inflight = Future()
+            owner = True
+        else:
+            owner = False
+    
+    if not owner:
+        return inflight.result()
+    
+    location = None
+    try:
+        location = run_async(probe_location())
+        if location:
+            with _location_lock:
+                _location_cache.update(time=time.monotonic(), value=location)
+        return location
+    finally:
+        with _location_lock:
+            _location_inflight = None
+        inflight.set_result(location)
+
+async def probe_location():
+    """Query every geolocation service concurrently and return the first usable answer, or None"""
+    try:
+        tasks = [asyncio.ensure_future(fetch_location(service)) for service in GEOLOCATION_SERVICES]
+        try:
+            for next_done in asyncio.as_completed(tasks, timeout=4):
+                try:
+                    location = await next_done
+                except asyncio.TimeoutError:
+                    break
+                except Exception:
+                    continue
                 
-                if lat and lon:
-                    return {
-                        'latitude': lat,
-                        'longitude': lon,
-                        'city': data.get('city', 'Unknown'),
-                        'country': data.get('country_name') or data.get('country', 'Unknown')
-                    }
-            except:
-                continue
+                if location:
+                    return location
+        finally:
+            # Don't wait for the slower services
+            for task in tasks:
+                task.cancel()
         
         return None
     except Exception as e:
         print(f"Location error: {e}")
         return None
+
+def open_video_capture(source):
+    """Open a camera index, GStreamer pipeline or video file, using hardware decoding where available"""
+    if isinstance(source, int):
+        cap = cv2.VideoCapture(source)
+        # Ask the webcam for MJPG to skip the YUYV -> BGR conversion on the CPU
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        return cap
+    
+    if '!' in source:
+        # GStreamer pipeline ending in appsink (needs OpenCV built with GStreamer)
+        return cv2.VideoCapture(source, cv2.CAP_GSTREAMER)
+    
+    # FFMPEG backend with NVDEC/VAAPI/etc. decode when the build supports it
+    cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG, [
+        cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+        cv2.CAP_PROP_HW_DEVICE, 0
+    ])
+    if not cap.isOpened():
+        cap = cv2.VideoCapture(source)
+    return cap
+
+def encode_jpeg(frame, quality=70):
+    """Encode a BGR frame to JPEG bytes, calling libjpeg-turbo directly when available"""
+    if turbo_jpeg is not None:
+        return turbo_jpeg.encode(frame, quality=quality, pixel_format=TJPF_BGR)
+    
+    ret, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    return buffer.tobytes()
+
+@lru_cache(maxsize=256)
+def detection_label(class_name, conf_pct):
+    """Label text and pixel size for a detection at a whole-percent confidence (101 labels per class)"""
+    label = f'{class_name} {conf_pct / 100}'
+    return label, cv2.getTextSize(label, 0, fontScale=1, thickness=2)[0]